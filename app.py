@@ -3,6 +3,7 @@ import pandas as pd
 import os
 from utils.email_validator import EmailValidator
 from utils.email_sender import EmailSender
+from utils.send_queue import get_send_queue, make_campaign_id
 import time
 import base64
 from pathlib import Path
@@ -158,6 +159,12 @@ def main():
         smtp_port = st.number_input("Port SMTP", value=587, key="smtp_port", help="Port standar untuk Gmail: 587")
         email_address = st.text_input("Alamat Email Anda", key="email_address", help="Email yang akan digunakan untuk mengirim", placeholder="nama@domain.com")
         email_password = st.text_input("Password/App Password", type="password", key="email_password", help="Gunakan App Password untuk Gmail")
+        extra_relays_text = st.text_area(
+            "Relay SMTP tambahan (opsional)",
+            key="extra_relays",
+            help="Satu relay per baris: server,port,email,password[,bobot[,kuota per jam]]. Beban dibagi sesuai bobot dan relay yang gagal dilewati otomatis.",
+            placeholder="smtp2.domain.com,587,relay@domain.com,password,2,500"
+        )
         
         if st.button("Simpan Konfigurasi Email", type="primary"):
             if email_address and email_password:
@@ -165,7 +172,8 @@ def main():
                     'smtp_server': smtp_server,
                     'smtp_port': smtp_port,
                     'email': email_address,
-                    'password': email_password
+                    'password': email_password,
+                    'relays': parse_relays(extra_relays_text)
                 }
                 st.success("Konfigurasi email berhasil disimpan!")
             else:
@@ -185,6 +193,29 @@ def main():
     elif page == "Scheduled Emails":
         scheduled_emails_page()
 
+def parse_relays(text):
+    """Parse 'server,port,email,password[,weight[,hourly_quota]]' lines into relay configs"""
+    relays = []
+    for line in (text or '').split('\n'):
+        fields = [field.strip() for field in line.split(',')]
+        if len(fields) < 4 or not all(fields[:4]):
+            continue
+        try:
+            relay = {
+                'smtp_server': fields[0],
+                'smtp_port': int(fields[1]),
+                'email': fields[2],
+                'password': fields[3],
+                'weight': float(fields[4]) if len(fields) > 4 and fields[4] else 1.0
+            }
+            if len(fields) > 5 and fields[5]:
+                relay['hourly_quota'] = int(fields[5])
+        except ValueError:
+            st.sidebar.warning(f"Relay diabaikan, format salah: {fields[0]}")
+            continue
+        relays.append(relay)
+    return relays
+
 def single_email_validation():
     st.markdown("""
     <div class="glass-card glowing">
@@ -331,6 +362,13 @@ def email_sender_page():
         # Send options
         send_option = st.radio("Send option:", ["Send now", "Schedule for later"])
         
+        resend = False
+        if send_option == "Send now":
+            resend = st.checkbox(
+                "Resend to recipients who already received this email",
+                help="By default, sending the same email again only continues an interrupted run"
+            )
+        
         scheduled_time = None
         if send_option == "Schedule for later":
             col_date, col_time = st.columns(2)
@@ -382,8 +420,19 @@ def email_sender_page():
             sender = EmailSender(st.session_state.email_credentials)
             
             if send_option == "Send now":
+                # Record every send in the durable queue so a crashed run can be resumed
+                queue = get_send_queue()
+                campaign_id = make_campaign_id(sender.email, subject, message, recipients)
+                if resend:
+                    queue.reset_campaign(campaign_id)
+                queue.enqueue(campaign_id, recipients)
+                already_done = len(queue.results(campaign_id))
+                if already_done:
+                    st.info(f"Resuming campaign: {already_done} recipients were already handled in an earlier run")
+                
                 with st.spinner("Sending emails..."):
-                    results = sender.send_bulk_email(recipients, subject, message, is_html=(message_format == "HTML"))
+                    results = sender.send_bulk_email(recipients, subject, message, is_html=(message_format == "HTML"),
+                                                     queue=queue, campaign_id=campaign_id)
                 
                 st.session_state.last_send_status = results
                 
@@ -413,8 +462,8 @@ def email_sender_page():
             
             else:  # Schedule for later
                 if scheduled_time:
-                    from utils.scheduler import EmailScheduler
-                    scheduler = EmailScheduler()
+                    from utils.scheduler import get_scheduler
+                    scheduler = get_scheduler()
                     
                     # Ensure scheduled_time is not NaT
                     scheduled_timestamp = pd.Timestamp(scheduled_time)
@@ -436,8 +485,8 @@ def scheduled_emails_page():
     st.header("Scheduled Emails")
     st.markdown("View and manage your scheduled email jobs.")
     
-    from utils.scheduler import EmailScheduler
-    scheduler = EmailScheduler()
+    from utils.scheduler import get_scheduler
+    scheduler = get_scheduler()
     
     # Responsive layout for scheduled emails
     if st.session_state.get('is_mobile', False):
@@ -449,19 +498,26 @@ def scheduled_emails_page():
         col1, col2 = st.columns([2, 1])
     
     with col1:
-        # Get scheduled jobs
-        jobs = scheduler.get_scheduled_jobs()
+        # Count jobs from the store's counters, then load one page of them
+        total_jobs = sum(entry['jobs'] for entry in scheduler.get_job_statistics().values())
         
-        if jobs:
+        if total_jobs:
             st.subheader("Scheduled Jobs")
             
+            page_size = 20
+            page_count = (total_jobs + page_size - 1) // page_size
+            page = 1
+            if page_count > 1:
+                page = st.number_input(f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1)
+            
+            jobs = scheduler.get_scheduled_jobs(limit=page_size, offset=(page - 1) * page_size)
             for job in jobs:
                 with st.expander(f"Job {job['id']} - {job['subject']}", expanded=False):
                     col_info, col_action = st.columns([3, 1])
                     
                     with col_info:
                         st.write(f"**Subject:** {job['subject']}")
-                        st.write(f"**Recipients:** {len(job['recipients'])} emails")
+                        st.write(f"**Recipients:** {job['total_count']} emails")
                         st.write(f"**Scheduled for:** {job['scheduled_time']}")
                         st.write(f"**Status:** {job['status']}")
                         
@@ -484,10 +540,14 @@ def scheduled_emails_page():
         if st.button("Refresh Jobs"):
             st.rerun()
         
-        if st.button("Clear Completed Jobs"):
-            scheduler.clear_completed_jobs()
-            st.success("Completed jobs cleared!")
-            st.rerun()
+        if st.button("Clear Completed Jobs", help="Move finished jobs to the compressed job archive"):
+            try:
+                scheduler.clear_completed_jobs()
+            except TimeoutError as e:
+                st.warning(str(e))
+            else:
+                st.success("Completed jobs archived!")
+                st.rerun()
         
         st.markdown("### Job Status Legend")
         st.info("""
@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 from utils.email_sender import EmailSender, EmailTemplate
+from utils.send_queue import get_send_queue, make_campaign_id
+from utils.suppression import get_suppression_list, UNSUBSCRIBED
 from datetime import datetime, timedelta
-import time
 
 def show_bulk_sender():
     st.header("📤 Bulk Email Sender")
@@ -16,6 +17,9 @@ def show_bulk_sender():
     # Test email connection
     test_connection()
     
+    # Addresses that must not be mailed
+    manage_suppression_list()
+    
     # Email composition interface
     compose_email_interface()
 
@@ -32,6 +36,35 @@ def test_connection():
         else:
             st.error(f"❌ Connection failed: {result['error']}")
 
+def manage_suppression_list():
+    """View and edit the suppression list"""
+    suppression_list = get_suppression_list()
+    
+    with st.expander(f"🚫 Suppression List ({len(suppression_list)} addresses)", expanded=False):
+        st.markdown("Hard bounces and addresses found invalid during validation are added automatically.")
+        
+        counts = suppression_list.counts()
+        if counts:
+            cols = st.columns(len(counts))
+            for col, (reason, count) in zip(cols, sorted(counts.items())):
+                col.metric(reason.replace('_', ' ').title(), count)
+        
+        unsubscribes = st.text_area(
+            "Add unsubscribed addresses (one per line):",
+            key="suppression_add"
+        )
+        if st.button("Add to Suppression List") and unsubscribes:
+            emails = [email.strip() for email in unsubscribes.split('\n') if email.strip()]
+            suppression_list.add_many([(email, UNSUBSCRIBED, None) for email in emails])
+            st.success(f"✅ {len(emails)} addresses suppressed")
+        
+        to_remove = st.text_input("Remove an address from the list:", key="suppression_remove")
+        if st.button("Remove") and to_remove:
+            if suppression_list.remove(to_remove):
+                st.success(f"✅ {to_remove} can be mailed again")
+            else:
+                st.info(f"{to_remove} is not on the suppression list")
+
 def compose_email_interface():
     """Main email composition interface"""
     
@@ -140,6 +173,9 @@ def compose_email_interface():
     
     with col2:
         schedule_datetime = None
+        priority = 0
+        recurrence = None
+        spread_minutes = 0
         if send_option == "Schedule for Later":
             schedule_date = st.date_input(
                 "Schedule Date:",
@@ -151,22 +187,60 @@ def compose_email_interface():
                 value=(datetime.now() + timedelta(hours=1)).time()
             )
             schedule_datetime = datetime.combine(schedule_date, schedule_time)
+            priority_label = st.selectbox(
+                "Priority:",
+                ["Normal", "High", "Low"],
+                help="When several scheduled jobs are due at once, higher priority jobs are sent first"
+            )
+            priority = {"Low": -1, "Normal": 0, "High": 1}[priority_label]
+            
+            repeat = st.selectbox(
+                "Repeat:",
+                ["Does not repeat", "Hourly", "Daily", "Weekly", "Monthly", "Custom (cron)"]
+            )
+            recurrence = build_recurrence(repeat, schedule_datetime)
+            if repeat == "Custom (cron)":
+                recurrence = st.text_input(
+                    "Cron expression (minute hour day month weekday):",
+                    value=recurrence,
+                    help="For example '0 9 * * 1-5' sends at 09:00 on weekdays"
+                )
+            
+            spread_minutes = st.number_input(
+                "Spread sending over (minutes):",
+                min_value=0,
+                max_value=7 * 24 * 60,
+                value=0,
+                help="Drip the emails out evenly over this window instead of sending them all at once. 0 sends right away."
+            )
     
     # Advanced options
     with st.expander("⚙️ Advanced Options", expanded=False):
         delay_between_emails = st.slider(
-            "Delay between emails (seconds):",
+            "Delay between emails to the same domain (seconds):",
             min_value=0.1,
             max_value=10.0,
             value=1.0,
             step=0.1,
-            help="Add delay to avoid being flagged as spam"
+            help="Add delay to avoid being flagged as spam. Sends to other domains continue while one domain waits."
+        )
+        
+        domain_intervals_text = st.text_area(
+            "Per-domain delay overrides (domain=seconds, one per line):",
+            placeholder="gmail.com=2\noutlook.com=3",
+            help="Slow down large providers without slowing down everyone else"
         )
+        domain_intervals = parse_domain_intervals(domain_intervals_text)
         
         test_mode = st.checkbox(
             "Test mode (send only to first 3 recipients)",
             help="Use this to test your email before sending to all recipients"
         )
+        
+        resend = st.checkbox(
+            "Resend to recipients who already received this email",
+            help="By default, sending the same email again only continues an interrupted run"
+        )
     
     # Send button
     if st.button("🚀 Send Emails", type="primary", disabled=not (recipients and subject and message)):
@@ -178,7 +252,8 @@ def compose_email_interface():
         send_emails(
             recipients, subject, message, is_html,
             send_option, scheduled_dt,
-            delay_between_emails, test_mode
+            delay_between_emails, test_mode, resend, domain_intervals, priority,
+            recurrence, spread_minutes * 60
         )
 
 def compose_custom_message():
@@ -262,7 +337,8 @@ def compose_notification(subject):
         st.session_state.message_is_html = True
 
 def send_emails(recipients, subject, message, is_html, send_option, 
-                schedule_datetime, delay, test_mode):
+                schedule_datetime, delay, test_mode, resend=False, domain_intervals=None, priority=0,
+                recurrence=None, spread_seconds=0):
     """Send or schedule emails"""
     
     # Apply test mode
@@ -271,38 +347,63 @@ def send_emails(recipients, subject, message, is_html, send_option,
         st.info(f"🧪 Test mode: Sending to first {len(recipients)} recipients only")
     
     if send_option == "Send Immediately":
-        send_immediately(recipients, subject, message, is_html, delay)
+        send_immediately(recipients, subject, message, is_html, delay, resend, domain_intervals)
     else:
-        schedule_emails(recipients, subject, message, is_html, schedule_datetime)
+        schedule_emails(recipients, subject, message, is_html, schedule_datetime, domain_intervals, priority,
+                        recurrence, spread_seconds)
 
-def send_immediately(recipients, subject, message, is_html, delay):
+def parse_domain_intervals(text):
+    """Parse 'domain=seconds' lines into a dict, skipping malformed lines"""
+    intervals = {}
+    for line in (text or '').split('\n'):
+        domain, _, seconds = line.partition('=')
+        try:
+            intervals[domain.strip().lower()] = float(seconds)
+        except ValueError:
+            continue
+    return intervals
+
+def send_immediately(recipients, subject, message, is_html, delay, resend=False, domain_intervals=None):
     """Send emails immediately"""
     sender = EmailSender(st.session_state.email_credentials)
+    sender.domain_intervals.update(domain_intervals or {})
+    
+    # Skip suppressed addresses up front so they don't show up as failures
+    recipients, suppressed = sender.suppression_list.split(recipients)
+    if suppressed:
+        st.warning(f"🚫 Skipping {len(suppressed)} suppressed recipients (bounced, unsubscribed or invalid)")
+    if not recipients:
+        st.error("❌ All recipients are on the suppression list")
+        return
+    
+    # Record every send in the durable queue so a crashed run can be resumed
+    queue = get_send_queue()
+    campaign_id = make_campaign_id(sender.email, subject, message, recipients)
+    if resend:
+        queue.reset_campaign(campaign_id)
+    queue.enqueue(campaign_id, recipients)
+    
+    already_done = len(queue.results(campaign_id))
+    if already_done:
+        st.info(f"♻️ Resuming campaign: {already_done} recipients were already handled in an earlier run")
     
     # Progress tracking
-    progress_bar = st.progress(0)
+    progress_bar = st.progress(already_done / len(recipients))
     status_text = st.empty()
     
-    # Results tracking
-    successful_sends = 0
-    failed_sends = []
+    def update_progress(done, total, recipient):
+        status_text.text(f"Sending to {recipient} ({done}/{total})")
+        progress_bar.progress(done / total)
     
     # Send emails
-    for i, recipient in enumerate(recipients):
-        status_text.text(f"Sending to {recipient} ({i+1}/{len(recipients)})")
-        
-        result = sender.send_single_email(recipient, subject, message, is_html)
-        
-        if result['success']:
-            successful_sends += 1
-        else:
-            failed_sends.append(result)
-        
-        progress_bar.progress((i + 1) / len(recipients))
-        
-        # Add delay between sends
-        if i < len(recipients) - 1:
-            time.sleep(delay)
+    results = sender.send_bulk_email(
+        recipients, subject, message, is_html, delay,
+        queue=queue, campaign_id=campaign_id, progress_callback=update_progress
+    )
+    
+    # Results tracking
+    successful_sends = sum(1 for r in results if r['success'])
+    failed_sends = [r for r in results if not r['success']]
     
     # Show results
     status_text.empty()
@@ -320,7 +421,21 @@ def send_immediately(recipients, subject, message, is_html, delay):
             for failed in failed_sends:
                 st.error(f"**{failed['recipient']}:** {failed['error']}")
 
-def schedule_emails(recipients, subject, message, is_html, schedule_datetime):
+def build_recurrence(repeat, schedule_datetime):
+    """Cron expression that repeats at the scheduled time, or None"""
+    minute, hour = schedule_datetime.minute, schedule_datetime.hour
+    if repeat == "Hourly":
+        return f"{minute} * * * *"
+    if repeat in ("Daily", "Custom (cron)"):
+        return f"{minute} {hour} * * *"
+    if repeat == "Weekly":
+        return f"{minute} {hour} * * {(schedule_datetime.weekday() + 1) % 7}"
+    if repeat == "Monthly":
+        return f"{minute} {hour} {schedule_datetime.day} * *"
+    return None
+
+def schedule_emails(recipients, subject, message, is_html, schedule_datetime, domain_intervals=None, priority=0,
+                    recurrence=None, spread_seconds=0):
     """Schedule emails for later sending"""
     from utils.scheduler import get_scheduler
     
@@ -333,12 +448,19 @@ def schedule_emails(recipients, subject, message, is_html, schedule_datetime):
             st.error("Invalid scheduled time")
             return
         
-        job_id = scheduler.schedule_email(
-            recipients, subject, message,
-            scheduled_timestamp,
-            st.session_state.email_credentials,
-            is_html
-        )
+        try:
+            job_id = scheduler.schedule_email(
+                recipients, subject, message,
+                scheduled_timestamp,
+                {**st.session_state.email_credentials, 'domain_intervals': domain_intervals or {}},
+                is_html,
+                priority=priority,
+                recurrence=recurrence,
+                spread_seconds=spread_seconds
+            )
+        except ValueError as e:
+            st.error(f"Invalid schedule: {str(e)}")
+            return
     else:
         st.error("Schedule date/time not provided")
         return
@@ -347,6 +469,10 @@ def schedule_emails(recipients, subject, message, is_html, schedule_datetime):
     st.info(f"**Job ID:** {job_id}")
     st.info(f"**Scheduled for:** {schedule_datetime.strftime('%Y-%m-%d %H:%M:%S')}")
     st.info(f"**Recipients:** {len(recipients)} emails")
+    if recurrence:
+        st.info(f"**Repeats:** `{recurrence}`")
+    if spread_seconds:
+        st.info(f"**Spread over:** {spread_seconds / 60:.0f} minutes")
 
 if __name__ == "__main__":
     show_bulk_sender()
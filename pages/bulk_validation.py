@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from utils.email_validator import EmailValidator
+from utils.suppression import get_suppression_list, INVALID
 import time
 
 def show_bulk_validation():
@@ -110,6 +111,7 @@ def validate_emails(emails, skip_smtp, batch_size):
     """Validate a list of emails with progress tracking"""
     
     validator = EmailValidator()
+    suppression_list = get_suppression_list()
     
     # Initialize progress tracking
     progress_bar = st.progress(0)
@@ -131,7 +133,7 @@ def validate_emails(emails, skip_smtp, batch_size):
             status_text.text(f"Validating email {current_index}/{total_emails}: {email}")
             
             # Validate email
-            result = validator.validate_single_email(email)
+            result = validator.validate_single_email(email, check_smtp=not skip_smtp)
             
             # Skip SMTP if requested
             if skip_smtp:
@@ -144,6 +146,10 @@ def validate_emails(emails, skip_smtp, batch_size):
                 result['confidence'] = confidence
                 result['is_valid'] = confidence >= 70
             
+            # Never mail addresses that are known to be undeliverable
+            if result.get('undeliverable'):
+                suppression_list.add(email, INVALID, result.get('error'))
+            
             batch_results.append(result)
             all_results.append(result)
             
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
+from datetime import datetime
+from itertools import chain
+from utils.discovery_store import get_discovery_store
 from utils.email_discovery import EmailDiscovery
 from utils.email_validator import EmailValidator
-import time
 
 
 def show_email_discovery():
@@ -71,12 +73,22 @@ def show_email_discovery():
             
             with col_settings2:
                 verify_patterns = st.checkbox("Verifikasi pola email umum", value=True)
+                use_saved = st.checkbox("Gunakan hasil tersimpan", value=True,
+                                        help="Domain yang sudah di-scan baru-baru ini tidak di-scan ulang")
             
             submitted = st.form_submit_button("Mulai Pencarian", type="primary")
             
             if submitted and domains_to_scan:
                 discovery = EmailDiscovery()
                 validator = EmailValidator() if verify_patterns else None
+                store = get_discovery_store()
+                store.delete_stale()
+                
+                # Recently crawled domains are answered from the store; only the rest are crawled
+                saved_results = store.get_fresh(domains_to_scan, max_pages) if use_saved else {}
+                domains_to_crawl = [domain for domain in domains_to_scan if domain not in saved_results]
+                if saved_results:
+                    st.info(f"{len(saved_results)} domain diambil dari hasil tersimpan")
                 
                 # Process multiple domains
                 all_results = []
@@ -87,13 +99,15 @@ def show_email_discovery():
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                for i, domain in enumerate(domains_to_scan):
-                    status_text.text(f"Memproses domain {i+1}/{len(domains_to_scan)}: {domain}")
-                    
-                    with st.spinner(f"Sedang mencari email di {domain}..."):
-                        result = discovery.discover_emails_from_domain(domain, max_pages)
+                # Domains are crawled concurrently; results arrive as each domain finishes
+                status_text.text(f"Memproses {len(domains_to_scan)} domain...")
+                results = chain(saved_results.values(), discovery.discover_domains(domains_to_crawl, max_pages))
+                for i, result in enumerate(results):
+                    domain = result['input_domain']
+                    needs_saving = not result.get('from_cache')
+                    status_text.text(f"Selesai {i+1}/{len(domains_to_scan)}: {domain}")
                     
-                    if result['status'] == 'domain_unreachable':
+                    if result['status'] in ('domain_unreachable', 'error'):
                         st.warning(f"Domain {domain} tidak dapat diakses: {result.get('error', 'Unknown error')}")
                         result['processed'] = False
                     else:
@@ -102,23 +116,27 @@ def show_email_discovery():
                         
                         # Handle pattern verification for this domain
                         if result['common_patterns'] and verify_patterns:
-                            pattern_results = discovery.verify_email_patterns(
-                                result['common_patterns'], 
-                                validator
-                            )
-                            result['pattern_verification'] = pattern_results
+                            pattern_results = result.get('pattern_verification')
+                            if pattern_results is None:
+                                pattern_results = discovery.verify_email_patterns(
+                                    result['common_patterns'], 
+                                    validator
+                                )
+                                result['pattern_verification'] = pattern_results
+                                needs_saving = True
                             if pattern_results['valid_emails']:
                                 all_pattern_results.extend(pattern_results['valid_emails'])
                     
+                    if needs_saving:
+                        # A saved result keeps its crawl time when verification is added to it
+                        crawled_ts = datetime.fromisoformat(result['crawled_time']).timestamp() if result.get('from_cache') else None
+                        store.save(domain, result, max_pages, crawled_ts)
+                    
                     all_results.append(result)
                     
                     # Update progress
                     progress = (i + 1) / len(domains_to_scan)
                     progress_bar.progress(progress)
-                    
-                    # Small delay between domains to be respectful
-                    if i < len(domains_to_scan) - 1:
-                        time.sleep(2)
                 
                 # Store results in session state
                 st.session_state.discovery_results = {
@@ -126,7 +144,9 @@ def show_email_discovery():
                     'all_emails_found': list(all_emails_found),
                     'all_pattern_results': all_pattern_results,
                     'total_domains': len(domains_to_scan),
-                    'successful_domains': sum(1 for r in all_results if r.get('processed', False))
+                    'successful_domains': sum(1 for r in all_results if r.get('processed', False)),
+                    'crawl_report': discovery.metrics.report() if domains_to_crawl else None,
+                    'crawl_events': list(discovery.metrics.events)
                 }
                 
                 status_text.success(f"Selesai memproses {len(domains_to_scan)} domain!")
@@ -213,11 +233,16 @@ def show_email_discovery():
                         key="download_all_valid_patterns"
                     )
                 
+                if results_data.get('crawl_report'):
+                    show_crawl_report(results_data['crawl_report'], results_data['crawl_events'])
+                
                 # Per-domain breakdown
                 st.subheader("Detail per Domain")
                 
                 for i, result in enumerate(results_data['all_results']):
                     with st.expander(f"Domain: {result['domain']} ({'Berhasil' if result.get('processed') else 'Gagal'})", expanded=False):
+                        if result.get('from_cache'):
+                            st.caption(f"Hasil tersimpan dari {result['crawled_time'][:16].replace('T', ' ')}")
                         if result.get('processed'):
                             col1, col2, col3 = st.columns(3)
                             
@@ -319,5 +344,48 @@ def show_email_discovery():
         """)
 
 
+def show_crawl_report(report, events):
+    """Where the crawl spent its time, overall, per host and per fetch"""
+    with st.expander("Statistik Crawl", expanded=False):
+        st.caption("Waktu tidur, fetch dan parsing dijumlahkan dari semua thread, "
+                   "sehingga bisa lebih besar dari durasi total.")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Durasi Total", f"{report['wall_seconds']}s")
+        with col2:
+            st.metric("Tidur (politeness)", f"{report['phase_seconds']['sleeping']}s")
+        with col3:
+            st.metric("Fetch", f"{report['phase_seconds']['fetching']}s")
+        with col4:
+            st.metric("Parsing", f"{report['phase_seconds']['parsing']}s")
+        
+        col5, col6, col7, col8 = st.columns(4)
+        with col5:
+            st.metric("Request", report['requests'])
+        with col6:
+            st.metric("Dari Cache", report['cache_hits'])
+        with col7:
+            st.metric("Dilewati robots.txt", report['robots_skipped'])
+        with col8:
+            st.metric("Error", report['errors'])
+        
+        if report['hosts']:
+            st.markdown("**Per Host:**")
+            hosts_df = pd.DataFrame.from_dict(report['hosts'], orient='index')
+            st.dataframe(hosts_df, use_container_width=True)
+        
+        if events:
+            st.markdown("**Per Fetch:**")
+            events_df = pd.DataFrame(events).drop(columns=['time'])
+            st.dataframe(events_df, use_container_width=True)
+            st.download_button(
+                label="Download Log Crawl (CSV)",
+                data=events_df.to_csv(index=False),
+                file_name=f"crawl_events_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv",
+                key="download_crawl_events"
+            )
+
+
 if __name__ == "__main__":
-    show_email_discovery()
\ No newline at end of file
+    show_email_discovery()
@@ -4,6 +4,9 @@ from utils.scheduler import get_scheduler
 from datetime import datetime
 import json
 
+# Job cards rendered per page
+JOBS_PER_PAGE = 20
+
 def show_scheduled_emails():
     st.header("Scheduled Email Management")
     st.markdown("View, manage, and monitor your scheduled email campaigns.")
@@ -18,16 +21,22 @@ def show_scheduled_emails():
             st.rerun()
     
     with col2:
-        if st.button("Clear Completed"):
-            scheduler.clear_completed_jobs()
-            st.success("Completed jobs cleared!")
-            st.rerun()
+        if st.button("Clear Completed", help="Move finished jobs to the compressed job archive"):
+            try:
+                scheduler.clear_completed_jobs()
+            except TimeoutError as e:
+                st.warning(str(e))
+            else:
+                st.success("Completed jobs archived!")
+                st.rerun()
     
-    # Get all scheduled jobs
-    jobs = scheduler.get_scheduled_jobs()
+    # Statistics come from counters maintained by the job store
+    stats = scheduler.get_job_statistics()
+    total_jobs = sum(entry['jobs'] for entry in stats.values())
     
-    if not jobs:
+    if not total_jobs:
         st.info("No scheduled emails found.")
+        show_archive_statistics(scheduler.get_archived_statistics())
         
         # Quick scheduling section
         st.subheader("Quick Schedule")
@@ -36,39 +45,49 @@ def show_scheduled_emails():
         return
     
     # Statistics overview
-    show_job_statistics(jobs)
+    show_job_statistics(stats)
+    show_archive_statistics(scheduler.get_archived_statistics())
     
     # Jobs management interface
     st.subheader("Scheduled Jobs")
     
     # Filter options
-    status_filter = st.selectbox(
-        "Filter by status:",
-        ["All", "Pending", "Sending", "Completed", "Failed", "Cancelled"]
-    )
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        status_filter = st.selectbox(
+            "Filter by status:",
+            ["All", "Pending", "Sending", "Completed", "Failed", "Cancelled"]
+        )
     
-    filtered_jobs = jobs
-    if status_filter != "All":
-        filtered_jobs = [job for job in jobs if job['status'].lower() == status_filter.lower()]
+    status = None if status_filter == "All" else status_filter.lower()
+    matching_jobs = total_jobs if status is None else stats.get(status, {}).get('jobs', 0)
     
-    if not filtered_jobs:
+    if not matching_jobs:
         st.info(f"No jobs with status '{status_filter}' found.")
         return
     
-    # Display jobs
-    for job in filtered_jobs:
+    with col2:
+        page_count = (matching_jobs + JOBS_PER_PAGE - 1) // JOBS_PER_PAGE
+        page = st.number_input(f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1)
+    
+    # Display one page of jobs
+    jobs = scheduler.get_scheduled_jobs(status, limit=JOBS_PER_PAGE, offset=(page - 1) * JOBS_PER_PAGE)
+    for job in jobs:
         display_job_card(job, scheduler)
 
-def show_job_statistics(jobs):
-    """Display job statistics overview"""
+def show_job_statistics(stats):
+    """Display job statistics overview from per-status counters"""
     st.subheader("Overview")
     
+    def jobs_with(status):
+        return stats.get(status, {}).get('jobs', 0)
+    
     # Calculate statistics
-    total_jobs = len(jobs)
-    pending_jobs = sum(1 for job in jobs if job['status'] == 'pending')
-    completed_jobs = sum(1 for job in jobs if job['status'] == 'completed')
-    failed_jobs = sum(1 for job in jobs if job['status'] == 'failed')
-    cancelled_jobs = sum(1 for job in jobs if job['status'] == 'cancelled')
+    total_jobs = sum(entry['jobs'] for entry in stats.values())
+    pending_jobs = jobs_with('pending')
+    completed_jobs = jobs_with('completed')
+    failed_jobs = jobs_with('failed')
+    cancelled_jobs = jobs_with('cancelled')
     
     # Display metrics
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -90,13 +109,22 @@ def show_job_statistics(jobs):
     
     # Success rate
     if completed_jobs > 0:
-        total_emails_sent = sum(job.get('success_count', 0) for job in jobs if job['status'] == 'completed')
-        total_emails_attempted = sum(job.get('total_count', 0) for job in jobs if job['status'] == 'completed')
+        total_emails_sent = stats['completed']['success_count']
+        total_emails_attempted = stats['completed']['total_count']
         
         if total_emails_attempted > 0:
             success_rate = (total_emails_sent / total_emails_attempted) * 100
             st.metric("Overall Success Rate", f"{success_rate:.1f}%")
 
+def show_archive_statistics(archived):
+    """One-line summary of jobs moved to the archive by the retention policy"""
+    if not archived['jobs']:
+        return
+    summary = f"{archived['jobs']} older jobs archived"
+    if archived['total_count']:
+        summary += f", {archived['success_count']}/{archived['total_count']} emails sent successfully"
+    st.caption(summary)
+
 def display_job_card(job, scheduler):
     """Display individual job card"""
     
@@ -141,6 +169,10 @@ def display_job_card(job, scheduler):
         
         with col2:
             st.write(f"**Scheduled for:** {format_datetime(job['scheduled_time'])}")
+            if job.get('recurrence'):
+                st.write(f"**Repeats:** `{job['recurrence']}`")
+            if job.get('spread_seconds'):
+                st.write(f"**Spread over:** {job['spread_seconds'] / 60:.0f} minutes")
             if job.get('sent_time'):
                 st.write(f"**Sent at:** {format_datetime(job['sent_time'])}")
         
@@ -149,11 +181,25 @@ def display_job_card(job, scheduler):
                 st.write(f"**Success rate:** {job.get('success_count', 0)}/{job['total_count']}")
                 success_rate = (job.get('success_count', 0) / job['total_count']) * 100
                 st.progress(success_rate / 100)
+            elif job['status'] == 'sending':
+                sent = job.get('success_count', 0)
+                failed = job.get('failed_count', 0)
+                done = sent + failed
+                st.write(f"**Progress:** {done}/{job['total_count']} ({sent} sent, {failed} failed, "
+                         f"{max(0, job['total_count'] - done)} pending)")
+                st.progress(min(1.0, done / job['total_count']) if job['total_count'] else 0.0)
+                rate = job_throughput(job)
+                if rate is not None:
+                    st.caption(f"{rate:.1f} emails/min")
             elif job['status'] == 'failed':
                 st.write(f"**Error:** {job.get('error', 'Unknown error')}")
         
-        # Expandable details
-        with st.expander(f"Details for Job {job['id']}", expanded=False):
+        # Details are loaded from the job store only when asked for
+        if st.checkbox(f"Show details for job {job['id']}", key=f"details_{job['id']}"):
+            job = scheduler.get_job_details(job['id'])
+            if job is None:
+                st.info("This job no longer exists.")
+                return
             
             # Email content preview
             st.markdown("**Email Preview:**")
@@ -197,6 +243,19 @@ def display_job_card(job, scheduler):
         
         st.markdown("---")
 
+def job_throughput(job):
+    """Emails per minute handled since the job started, or None before the first outcome"""
+    started = pd.Timestamp(job.get('started_time')) if job.get('started_time') else None
+    updated = pd.Timestamp(job.get('progress_time')) if job.get('progress_time') else None
+    if started is None or updated is None:
+        return None
+    
+    minutes = (updated - started).total_seconds() / 60
+    done = job.get('success_count', 0) + job.get('failed_count', 0)
+    if minutes <= 0 or not done:
+        return None
+    return done / minutes
+
 def format_datetime(datetime_str):
     """Format datetime string for display"""
     if not datetime_str:
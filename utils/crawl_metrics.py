@@ -0,0 +1,128 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import requests
+
+from utils.crawl_politeness import url_host
+
+# Where crawler threads spend their time
+PHASES = ('sleeping', 'fetching', 'parsing')
+
+
+class CrawlMetrics:
+    """
+    Record of one crawl run: an event for every URL the crawler dealt with
+    (fetched, served from cache, skipped by robots.txt or failed) and the
+    time its threads spent sleeping for politeness, fetching and parsing.
+    Phase times add up over threads, so together they can exceed the
+    run's wall time.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.events: List[Dict] = []
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self._lock = threading.Lock()
+
+    def add_time(self, phase: str, seconds: float):
+        with self._lock:
+            self.phase_seconds[phase] += seconds
+
+    @contextmanager
+    def timed(self, phase: str):
+        """Count the time spent in a block towards a phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def record(self, url: str, **fields) -> Dict:
+        """Add an event for a URL; returns it so later steps (parsing) can fill it in"""
+        event = {
+            'time': time.time(),
+            'url': url,
+            'host': url_host(url),
+            'status': None,
+            'bytes': 0,
+            'wait_ms': None,
+            'queued_ms': None,
+            'dns_ms': None,
+            'connect_ms': None,
+            'ttfb_ms': None,
+            'total_ms': None,
+            'emails_found': None,
+            'from_cache': False,
+            'revalidated': False,
+            'robots_skipped': False,
+            'truncated': False,
+            'error': None,
+        }
+        event.update(fields)
+        with self._lock:
+            self.events.append(event)
+        return event
+
+    def record_response(self, url: str, response: requests.Response) -> Dict:
+        """Add the event of a completed fetch, with the timings the fetch engine measured"""
+        return self.record(
+            url,
+            status=response.status_code,
+            bytes=len(response.content),
+            from_cache=getattr(response, 'from_cache', False),
+            revalidated=getattr(response, 'revalidated', False),
+            truncated=getattr(response, 'truncated', False),
+            **getattr(response, 'timings', {})
+        )
+
+    def report(self) -> Dict:
+        """Totals of the run so far, overall and per host"""
+        with self._lock:
+            events = list(self.events)
+            phases = dict(self.phase_seconds)
+
+        hosts = {}
+        status_counts = {}
+        for event in events:
+            host = hosts.setdefault(event['host'], {
+                'requests': 0, 'cache_hits': 0, 'robots_skipped': 0, 'errors': 0,
+                'bytes_downloaded': 0, 'emails_found': 0, 'ttfb_ms': [], 'total_ms': [],
+            })
+            if event['robots_skipped']:
+                host['robots_skipped'] += 1
+                continue
+            if event['error'] and event['status'] is None:
+                host['errors'] += 1
+                continue
+            if event['from_cache'] and not event['revalidated']:
+                host['cache_hits'] += 1
+            else:
+                host['requests'] += 1
+            # Bodies served from the cache were not downloaded
+            if not event['from_cache']:
+                host['bytes_downloaded'] += event['bytes']
+            host['emails_found'] += event['emails_found'] or 0
+            for timing in ('ttfb_ms', 'total_ms'):
+                if event[timing] is not None:
+                    host[timing].append(event[timing])
+            status_counts[event['status']] = status_counts.get(event['status'], 0) + 1
+
+        for host in hosts.values():
+            for timing in ('ttfb_ms', 'total_ms'):
+                values = host.pop(timing)
+                host[f"avg_{timing}"] = round(sum(values) / len(values), 1) if values else None
+
+        return {
+            'wall_seconds': round(time.time() - self.started, 2),
+            'phase_seconds': {phase: round(seconds, 2) for phase, seconds in phases.items()},
+            'requests': sum(host['requests'] for host in hosts.values()),
+            'cache_hits': sum(host['cache_hits'] for host in hosts.values()),
+            'robots_skipped': sum(host['robots_skipped'] for host in hosts.values()),
+            'errors': sum(host['errors'] for host in hosts.values()),
+            'bytes_downloaded': sum(host['bytes_downloaded'] for host in hosts.values()),
+            'pages_with_emails': sum(1 for event in events if event['emails_found']),
+            'status_counts': status_counts,
+            'hosts': hosts,
+        }
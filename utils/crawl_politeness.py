@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from utils.domain_throttle import DomainThrottle
+
+
+def url_host(url: str) -> str:
+    """Host part of a URL, lowercased"""
+    return urlparse(url).netloc.lower()
+
+
+class HostPoliteness:
+    """
+    Per-host pacing for crawlers that fetch from many hosts at once. Every
+    host gets a minimum interval between the starts of two requests, raised
+    to the host's robots.txt Crawl-delay when it asks for more. Threads
+    waiting on different hosts never wait for each other.
+    """
+
+    def __init__(self, min_interval: float = 2.0, user_agent: str = '*', max_crawl_delay: float = 30.0,
+                 fetch_robots: Optional[Callable[[str], Optional[str]]] = None):
+        self.throttle = DomainThrottle(min_interval)
+        self.user_agent = user_agent
+        self.max_crawl_delay = max_crawl_delay
+        # Returns the robots.txt text for a URL, or None if there is none
+        self.fetch_robots = fetch_robots
+        self._lock = threading.Lock()
+        self._robots = {}  # host -> RobotFileParser, or None when robots.txt is missing
+        self._robots_loading = {}  # host -> Event set once its robots.txt is loaded
+
+    def wait_turn(self, url: str) -> float:
+        """Block until the URL's host may be fetched again and claim that slot; returns seconds waited"""
+        host = url_host(url)
+        with self._lock:
+            start = max(time.time(), self.throttle.next_slot(host))
+            self.throttle.reserve(host, start)
+        delay = start - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return max(0.0, delay)
+
+    def allowed(self, url: str) -> bool:
+        """Whether robots.txt of the URL's host allows fetching it"""
+        robots = self._robots_for(url)
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    def sitemaps(self, url: str) -> List[str]:
+        """Sitemap URLs listed in robots.txt of the URL's host"""
+        robots = self._robots_for(url)
+        return (robots.site_maps() or []) if robots is not None else []
+
+    def _robots_for(self, url: str) -> Optional[RobotFileParser]:
+        """Parsed robots.txt of the URL's host, fetched once per host"""
+        if self.fetch_robots is None:
+            return None
+
+        host = url_host(url)
+        with self._lock:
+            if host in self._robots:
+                return self._robots[host]
+            loading = self._robots_loading.get(host)
+            if loading is None:
+                loading = self._robots_loading[host] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            loading.wait()
+            return self._robots.get(host)
+
+        robots = None
+        try:
+            parsed = urlparse(url)
+            text = self.fetch_robots(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+            if text is not None:
+                robots = RobotFileParser()
+                robots.parse(text.splitlines())
+                delay = robots.crawl_delay(self.user_agent)
+                if delay:
+                    interval = min(float(delay), self.max_crawl_delay)
+                    if interval > self.throttle.default_interval:
+                        self.throttle.domain_intervals[host] = interval
+        finally:
+            with self._lock:
+                self._robots[host] = robots
+                del self._robots_loading[host]
+            loading.set()
+        return robots
@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+DEFAULT_DISCOVERY_DB = os.environ.get("EMAIL_DISCOVERY_DB", "discovery_results.db")
+DEFAULT_TTL_DAYS = float(os.environ.get("EMAIL_DISCOVERY_TTL_DAYS", "7"))
+
+# Results of crawls that found no website may change soon; they are kept for an hour
+FAILED_TTL_SECONDS = 3600
+
+
+def domain_key(domain: str) -> str:
+    """Domain as stored: lowercased, without scheme, path or leading www."""
+    domain = domain.strip().lower()
+    host = urlparse(domain if '://' in domain else f"//{domain}").netloc or domain
+    return host[4:] if host.startswith('www.') else host
+
+
+class DiscoveryStore:
+    """
+    Persistent per-domain discovery results. Each domain keeps its latest
+    crawl (emails found, pages scanned, status and, once run, the pattern
+    verification) with the time it was crawled; results older than the TTL
+    are stale and the domain is crawled again.
+    """
+
+    def __init__(self, db_file: str = DEFAULT_DISCOVERY_DB, ttl_days: float = DEFAULT_TTL_DAYS):
+        self.db_file = db_file
+        self.ttl_seconds = ttl_days * 86400
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS domain_results (
+                domain TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                max_pages INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                crawled_ts REAL NOT NULL
+            )
+        """)
+
+    def get_fresh(self, domains: List[str], max_pages: int) -> Dict[str, Dict]:
+        """
+        Stored results that are still fresh, by domain as given. A result
+        crawled with fewer pages than `max_pages` is not reused.
+        """
+        now = time.time()
+        fresh = {}
+        with self._lock:
+            for domain in domains:
+                row = self._conn.execute(
+                    "SELECT * FROM domain_results WHERE domain = ?", (domain_key(domain),)
+                ).fetchone()
+                if row is None or row['max_pages'] < max_pages:
+                    continue
+                ttl = self.ttl_seconds if row['status'] == 'success' else FAILED_TTL_SECONDS
+                if now - row['crawled_ts'] >= ttl:
+                    continue
+                result = json.loads(row['result'])
+                result['input_domain'] = domain
+                result['crawled_time'] = datetime.fromtimestamp(row['crawled_ts']).isoformat()
+                result['from_cache'] = True
+                fresh[domain] = result
+        return fresh
+
+    def save(self, domain: str, result: Dict, max_pages: int, crawled_ts: Optional[float] = None):
+        """Store the result of crawling a domain; errors from the crawler itself are not kept"""
+        if result['status'] == 'error':
+            return
+        stored = {key: value for key, value in result.items()
+                  if key not in ('input_domain', 'processed', 'crawled_time', 'from_cache')}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO domain_results (domain, status, max_pages, result, crawled_ts) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (domain_key(domain), result['status'], max_pages, json.dumps(stored),
+                 crawled_ts if crawled_ts is not None else time.time())
+            )
+
+    def delete_stale(self) -> int:
+        """Remove results past their TTL; returns how many"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM domain_results WHERE crawled_ts < ? OR (status != 'success' AND crawled_ts < ?)",
+                (now - self.ttl_seconds, now - FAILED_TTL_SECONDS)
+            )
+            return cursor.rowcount
+
+
+# Global discovery store instance
+_store_instance = None
+_store_lock = threading.Lock()
+
+def get_discovery_store() -> DiscoveryStore:
+    """Get global discovery store instance"""
+    global _store_instance
+    with _store_lock:
+        if _store_instance is None:
+            _store_instance = DiscoveryStore()
+    return _store_instance
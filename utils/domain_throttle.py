@@ -0,0 +1,165 @@
+import heapq
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+# Reply code large providers use to ask a sender to slow down
+THROTTLED_CODE = 421
+
+
+def recipient_domain(recipient: str) -> str:
+    """Destination domain of a recipient address"""
+    return recipient.rsplit('@', 1)[-1].strip().lower()
+
+
+class DomainThrottle:
+    """
+    Paces sends per destination domain. Every domain gets its own minimum
+    interval between the starts of two sends, and a 421 reply from a domain
+    pushes its next send slot back with an exponentially growing penalty that
+    decays again as sends succeed.
+    
+    One throttle may be shared by several threads, each passing its own
+    `interval` for the domains it sends to (see `get_domain_throttle`).
+    """
+
+    def __init__(self, default_interval: float, domain_intervals: Optional[Dict[str, float]] = None,
+                 max_backoff: float = 600.0):
+        self.default_interval = max(0.0, default_interval)
+        self.domain_intervals = {domain.lower(): interval for domain, interval in (domain_intervals or {}).items()}
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._next_slot = defaultdict(float)
+        self._backoff = defaultdict(float)
+
+    def interval(self, domain: str) -> float:
+        """Minimum number of seconds between two sends to a domain"""
+        return self.domain_intervals.get(domain, self.default_interval)
+
+    def next_slot(self, domain: str) -> float:
+        """Earliest time (epoch seconds) at which the domain may receive the next send"""
+        return self._next_slot.get(domain, 0.0)
+
+    def reserve(self, domain: str, start: Optional[float] = None, interval: Optional[float] = None):
+        """Claim the domain's current send slot for a send starting now, or at `start` (epoch seconds)"""
+        start = time.time() if start is None else start
+        interval = self.interval(domain) if interval is None else interval
+        with self._lock:
+            self._next_slot[domain] = start + interval + self._backoff[domain]
+
+    def try_reserve(self, domain: str, interval: Optional[float] = None) -> bool:
+        """Claim the domain's send slot for a send starting now, unless the slot is still in the future"""
+        now = time.time()
+        interval = self.interval(domain) if interval is None else interval
+        with self._lock:
+            if self._next_slot[domain] > now:
+                return False
+            self._next_slot[domain] = now + interval + self._backoff[domain]
+            return True
+
+    def record_send(self, domain: str, smtp_code: Optional[int] = None, interval: Optional[float] = None):
+        """Update the domain's pacing after a send attempt finished"""
+        interval = self.interval(domain) if interval is None else interval
+        with self._lock:
+            if smtp_code == THROTTLED_CODE:
+                base = max(interval, 1.0)
+                self._backoff[domain] = min(self.max_backoff, max(base, self._backoff[domain] * 2))
+                self._next_slot[domain] = max(self._next_slot[domain], time.time() + self._backoff[domain])
+            else:
+                self._backoff[domain] /= 2
+
+
+class DomainQueues:
+    """
+    One queue of recipients per destination domain. `pop` always returns the
+    entry that can be sent soonest across all domains, so domains interleave
+    and a large domain waiting on its throttle never blocks the small ones.
+    """
+
+    def __init__(self, throttle: DomainThrottle):
+        self.throttle = throttle
+        self._queues = defaultdict(list)  # domain -> heap of (ready time, order, recipient, attempts)
+        self._domains = []  # heap of (eligible time, domain), may contain stale keys
+        self._keys = {}  # domain -> its current key in the heap
+        self._order = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, recipient: str, ready_at: float = 0.0, attempts: int = 0):
+        """Queue a recipient that may be sent from `ready_at` (epoch seconds) on"""
+        domain = recipient_domain(recipient)
+        heapq.heappush(self._queues[domain], (ready_at, self._order, recipient, attempts))
+        self._order += 1
+        self._size += 1
+        eligible = self._eligible_time(domain)
+        if domain not in self._keys or eligible < self._keys[domain]:
+            self._schedule(domain, eligible)
+
+    def next_ready_time(self) -> float:
+        """Time (epoch seconds) at which the entry `pop` would return can be sent"""
+        while self._domains:
+            key, domain = self._domains[0]
+            if self._keys.get(domain) != key:
+                heapq.heappop(self._domains)
+                continue
+
+            eligible = self._eligible_time(domain)
+            if eligible > key:
+                heapq.heappop(self._domains)
+                self._schedule(domain, eligible)
+                continue
+            return eligible
+
+        raise IndexError("next_ready_time of empty DomainQueues")
+
+    def pop(self) -> Tuple[float, str, int]:
+        """Remove and return (send time, recipient, attempts) of the entry that can be sent soonest"""
+        while self._domains:
+            key, domain = heapq.heappop(self._domains)
+            if self._keys.get(domain) != key:
+                continue
+
+            eligible = self._eligible_time(domain)
+            if eligible > key:
+                # The domain was throttled after this key was pushed
+                self._schedule(domain, eligible)
+                continue
+
+            queue = self._queues[domain]
+            _, _, recipient, attempts = heapq.heappop(queue)
+            self._size -= 1
+            if queue:
+                self._schedule(domain, self._eligible_time(domain))
+            else:
+                del self._queues[domain]
+                del self._keys[domain]
+            return eligible, recipient, attempts
+
+        raise IndexError("pop from empty DomainQueues")
+
+    def _schedule(self, domain: str, eligible: float):
+        self._keys[domain] = eligible
+        heapq.heappush(self._domains, (eligible, domain))
+
+    def _eligible_time(self, domain: str) -> float:
+        return max(self._queues[domain][0][0], self.throttle.next_slot(domain))
+
+
+# Global send throttle instance
+_throttle_instance = None
+_throttle_lock = threading.Lock()
+
+def get_domain_throttle() -> DomainThrottle:
+    """
+    Get the global throttle for outgoing mail, shared by every send in the
+    process so per-domain pacing and 421 backoff hold across concurrent
+    campaigns, jobs and chunks
+    """
+    global _throttle_instance
+    with _throttle_lock:
+        if _throttle_instance is None:
+            _throttle_instance = DomainThrottle(0.0)
+    return _throttle_instance
@@ -1,17 +1,75 @@
 import re
+import html
 import requests
 import trafilatura
-from urllib.parse import urljoin, urlparse
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse, unquote
 import random
-from typing import List, Dict, Set
+from typing import Iterator, List, Dict, Optional, Set
 import dns.resolver
 import urllib3
+from utils.crawl_metrics import CrawlMetrics
+from utils.crawl_politeness import HostPoliteness
+from utils.fetch_engine import FetchEngine, is_text_content
+from utils.http_cache import HttpCache, get_http_cache
+
+# Numeric character reference, as used to hide addresses from scrapers (&#64; or &#x40;)
+_ENTITY = r'&#(?:[xX][0-9a-fA-F]{1,4}|[0-9]{1,5});'
+# An @ written plainly, as an entity or percent-encoded in a mailto: link
+_AT = r'(?:@|&commat;|&#0*64;|&#[xX]0*40;|%40)'
+# Address candidate in raw HTML. The local part never gives back what it
+# matched (possessive), so text without an @ is passed over without backtracking
+_RAW_EMAIL = re.compile(
+    rf'(?<![A-Za-z0-9._%+-])'
+    rf'(?:[A-Za-z0-9._+-]++|%(?!40)|&#(?!0*64;|[xX]0*40;)(?:[xX][0-9a-fA-F]{{1,4}}|[0-9]{{1,5}});)++'
+    rf'{_AT}'
+    rf'(?:[A-Za-z0-9-]++|\.|&period;|%2[eE]|{_ENTITY})++'
+)
+
+# Links in a page: (href, anchor text)
+_LINK = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\'#]+)[^"\']*["\'][^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]+>')
+_SITEMAP_LOC = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+
+# Words in a link's path or text that suggest a page lists addresses, and their weight
+CONTACT_KEYWORDS = {
+    'contact': 10, 'kontak': 10, 'hubungi': 10, 'impressum': 9, 'imprint': 9,
+    'team': 6, 'tim': 6, 'staff': 6, 'people': 6, 'leadership': 5, 'management': 5,
+    'about': 5, 'tentang': 5, 'company': 3, 'support': 3, 'help': 2,
+    'careers': 2, 'karir': 2, 'jobs': 2, 'press': 2, 'media': 1, 'legal': 1, 'privacy': 1,
+}
+
+# Linked files that are never worth scanning
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.mp4', '.mp3',
+                      '.css', '.js', '.xml', '.gz', '.doc', '.docx', '.xls', '.xlsx')
 
 
 class EmailDiscovery:
-    def __init__(self):
+    """
+    Finds email addresses published on company websites. Many domains can be
+    crawled at once with `discover_domains`; requests to the same host are
+    paced by a shared `HostPoliteness` (minimum interval per host, raised to
+    the site's robots.txt Crawl-delay), and pages robots.txt disallows are
+    skipped. Requests go through a `FetchEngine` that bounds connections
+    overall and per host, and pages of one domain are fetched overlapping
+    each other. Responses are kept in an on-disk `HttpCache`, so repeat
+    scans only revalidate pages that may have changed.
+    
+    Pages are chosen from the homepage's links and, when those are not
+    enough, the site's sitemap, ranked by how likely they are to list
+    contacts. `common_pages` is only probed for sites where neither yields
+    a candidate.
+    
+    Every URL handled is recorded in `metrics` (a `CrawlMetrics`, renewed
+    by each `discover_domains` run) with its status, size, timings and
+    emails found, along with the time spent sleeping, fetching and parsing.
+    """
+    
+    def __init__(self, min_host_interval: float = 2.0, max_workers: int = 16, max_connections: int = 16,
+                 http_cache: Optional[HttpCache] = None, use_cache: bool = True,
+                 use_trafilatura: bool = False, max_page_bytes: int = 1024 * 1024):
         self.email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+        # Fallback paths for sites whose links can't be read (e.g. script-rendered)
         self.common_pages = [
             '',
             '/contact',
@@ -50,6 +108,25 @@ class EmailDiscovery:
         })
         self.session.verify = False  # Handle SSL issues for some sites
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)  # Disable SSL warnings
+        # At most max_connections requests in flight, two per host; bodies are
+        # streamed up to max_page_bytes and skipped unless they are text or HTML
+        self.engine = FetchEngine(self.session, max_connections=max_connections, max_bytes=max_page_bytes)
+        # Lets every domain worker fetch as many pages at once as its host allows
+        self.page_pool = ThreadPoolExecutor(max_workers=max_workers * self.engine.max_per_host)
+        
+        # Domains crawled in parallel; they spend most of their time waiting
+        # for their host's politeness interval, not holding a connection
+        self.max_workers = max_workers
+        self.politeness = HostPoliteness(min_host_interval, fetch_robots=self._fetch_robots)
+        
+        # Shared across runs; fresh entries are served without any request
+        self.http_cache = (http_cache or get_http_cache()) if use_cache else None
+        
+        self.metrics = CrawlMetrics()
+        
+        # Boilerplate removal costs far more than the scan and its text is a
+        # subset of the HTML, so it only runs when asked for
+        self.use_trafilatura = use_trafilatura
         
         # Alternative user agents for rotation
         self.user_agents = [
@@ -59,9 +136,37 @@ class EmailDiscovery:
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15'
         ]
         
+    def discover_domains(self, domains: List[str], max_pages: int = 5) -> Iterator[Dict]:
+        """
+        Discover emails on several domains concurrently, yielding each
+        domain's result as soon as it is finished. Every result carries the
+        domain as given in 'input_domain'. `metrics` covers this run only.
+        """
+        self.metrics = CrawlMetrics()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.discover_emails_from_domain, domain, max_pages): domain
+                       for domain in domains}
+            for future in as_completed(futures):
+                domain = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        'domain': domain,
+                        'emails_found': [],
+                        'pages_scanned': [],
+                        'common_patterns': [],
+                        'status': 'error',
+                        'error': str(e)
+                    }
+                result['input_domain'] = domain
+                yield result
+    
     def discover_emails_from_domain(self, domain: str, max_pages: int = 5) -> Dict:
         """
-        Discover email addresses from a domain website
+        Discover email addresses from a domain website. Every URL is requested
+        at most once per call: the reachability probe doubles as the homepage
+        scan, and pages without emails are not downloaded again.
         """
         if not domain.startswith(('http://', 'https://')):
             domain = f"https://{domain}"
@@ -74,71 +179,19 @@ class EmailDiscovery:
             'status': 'success'
         }
         
-        # Try multiple strategies to access the domain
-        access_successful = False
-        final_domain = domain
+        # URL -> response (None if the request failed) for this run
+        fetched = {}
         
-        strategies = [
-            {'method': 'GET', 'ua_rotate': False},
-            {'method': 'GET', 'ua_rotate': True},
-            {'method': 'HEAD', 'ua_rotate': True},
-        ]
+        # Probe the homepage, falling back to plain HTTP if HTTPS fails
+        final_domain = domain
+        response = self._get_page(domain, fetched, referer='https://www.google.com/')
+        if response is None and isinstance(fetched.get(('error', domain)), requests.exceptions.SSLError):
+            http_domain = domain.replace('https://', 'http://')
+            response = self._get_page(http_domain, fetched, referer='https://www.google.com/')
+            if response is not None:
+                final_domain = http_domain
         
-        for strategy in strategies:
-            if access_successful:
-                break
-                
-            try:
-                # Add random delay to appear more human-like
-                time.sleep(random.uniform(1, 3))
-                
-                # Rotate user agent if requested
-                if strategy['ua_rotate']:
-                    self.session.headers['User-Agent'] = random.choice(self.user_agents)
-                
-                # Add referrer to look more natural
-                self.session.headers['Referer'] = 'https://www.google.com/'
-                
-                if strategy['method'] == 'HEAD':
-                    response = self.session.head(domain, timeout=15, allow_redirects=True)
-                else:
-                    response = self.session.get(domain, timeout=15, allow_redirects=True)
-                
-                if response.status_code == 200:
-                    access_successful = True
-                    final_domain = domain
-                    break
-                elif response.status_code == 403:
-                    # Try with different approach for 403
-                    continue
-                elif response.status_code >= 400:
-                    continue
-                else:
-                    access_successful = True
-                    final_domain = domain
-                    break
-                    
-            except requests.exceptions.SSLError:
-                # Try with HTTP if HTTPS fails
-                try:
-                    http_domain = domain.replace('https://', 'http://')
-                    time.sleep(random.uniform(1, 2))
-                    
-                    if strategy['method'] == 'HEAD':
-                        response = self.session.head(http_domain, timeout=15, allow_redirects=True)
-                    else:
-                        response = self.session.get(http_domain, timeout=15, allow_redirects=True)
-                    
-                    if response.status_code == 200 or (response.status_code < 400 and response.status_code >= 300):
-                        access_successful = True
-                        final_domain = http_domain
-                        break
-                except Exception:
-                    continue
-            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
-                continue
-            except Exception:
-                continue
+        access_successful = response is not None and response.status_code < 400
         
         if not access_successful:
             # Final fallback - try to at least verify domain exists via DNS
@@ -147,40 +200,56 @@ class EmailDiscovery:
                 dns.resolver.resolve(parsed_domain, 'A')
                 # Domain exists but website might be protected, continue with limited scan
                 result['error'] = 'Website protected by anti-bot measures, attempting limited scan'
-            except Exception:
+            except Exception as e:
                 result['status'] = 'domain_unreachable'
                 result['error'] = 'Domain not accessible - website may be down or blocking automated access'
+                result['dns_error'] = f"{type(e).__name__}: {e}"
                 return result
         
         # Update domain to use the successful one
         domain = final_domain
         
-        pages_to_scan = []
         base_domain = urlparse(domain).netloc
         
-        # Add main page and common pages
-        for page in self.common_pages[:max_pages]:
-            page_url = urljoin(domain, page)
-            pages_to_scan.append(page_url)
+        # The homepage counts as one of the pages, followed by the best candidates
+        pages_to_scan = [domain] + self._candidate_pages(domain, response if access_successful else None, fetched)
+        # Candidates that turn out not to exist don't use up the page budget,
+        # but the number of requests per domain stays bounded
+        attempts_left = max_pages * 2
+        pages_found = 0
         
-        # Scan each page with anti-detection measures
-        for i, page_url in enumerate(pages_to_scan):
-            try:
-                # Add random delay between pages to appear human-like
-                if i > 0:
-                    time.sleep(random.uniform(2, 5))
-                
-                # Rotate user agent occasionally
-                if random.random() < 0.3:  # 30% chance to rotate
-                    self.session.headers['User-Agent'] = random.choice(self.user_agents)
+        # Fetch pages in small overlapping batches, so one slow page doesn't
+        # hold up the next; pacing per host is left to the politeness scheduler
+        remaining = iter(pages_to_scan)
+        while pages_found < max_pages and attempts_left > 0:
+            batch, requests_in_batch = [], 0
+            for page_url in remaining:
+                if page_url not in fetched:
+                    if not self.politeness.allowed(page_url):
+                        self.metrics.record(page_url, robots_skipped=True)
+                        continue
+                    attempts_left -= 1
+                    requests_in_batch += 1
+                batch.append(page_url)
+                if (len(batch) >= max_pages - pages_found or requests_in_batch >= self.engine.max_per_host
+                        or attempts_left <= 0):
+                    break
+            if not batch:
+                break
+            
+            responses = self.page_pool.map(lambda url: self._get_page(url, fetched, referer=domain), batch)
+            for page_url, response in zip(batch, responses):
+                if not self._is_page(response):
+                    continue
+                pages_found += 1
                 
-                emails = self._extract_emails_from_page(page_url)
+                with self.metrics.timed('parsing'):
+                    emails = self._extract_emails(response)
+                if getattr(response, 'event', None) is not None:
+                    response.event['emails_found'] = len(emails)
                 if emails:
                     result['emails_found'].update(emails)
                     result['pages_scanned'].append(page_url)
-                
-            except Exception as e:
-                continue
         
         # Generate common email patterns based on domain
         result['common_patterns'] = self._generate_email_patterns(base_domain)
@@ -191,80 +260,211 @@ class EmailDiscovery:
         
         return result
     
-    def _extract_emails_from_page(self, url: str) -> Set[str]:
+    def _candidate_pages(self, domain: str, homepage: Optional[requests.Response], fetched: Dict) -> List[str]:
         """
-        Extract emails from a single webpage with anti-detection measures
+        Pages of the site worth scanning, most likely contact page first.
+        Links of the homepage are used first; the sitemap is only read when
+        they give fewer than a handful of candidates.
         """
-        emails = set()
+        # After a redirect to another domain (brand.com -> brand.co.id) the
+        # site is where the homepage ended up
+        site = domain
+        if homepage is not None:
+            final = urlparse(homepage.url)
+            site = f"{final.scheme}://{final.netloc}"
+        host = self._site_host(site)
+        homepage_urls = {domain.rstrip('/'), site.rstrip('/')}
+        if homepage is not None:
+            homepage_urls.add(homepage.url.rstrip('/'))
+        candidates = {}  # url -> score
         
-        # Add referrer header to appear more natural
-        original_referer = self.session.headers.get('Referer')
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        self.session.headers['Referer'] = base_url
+        def add(url: str, text: str = ''):
+            parsed = urlparse(url)
+            if parsed.scheme not in ('http', 'https') or self._site_host(url) != host:
+                return
+            if parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+                return
+            url = parsed._replace(fragment='').geturl()
+            score = self._contact_score(parsed.path, text)
+            if score > 0 and url.rstrip('/') not in homepage_urls:
+                candidates[url] = max(score, candidates.get(url, 0))
         
-        try:
-            # Try multiple methods to get content
-            methods = [
-                {'use_session': True, 'timeout': 10},
-                {'use_session': True, 'timeout': 15},
-                {'use_trafilatura': True}
-            ]
-            
-            for method in methods:
-                if emails:  # If we already found emails, don't try other methods
-                    break
-                    
-                try:
-                    if method.get('use_session'):
-                        response = self.session.get(url, timeout=method['timeout'], allow_redirects=True)
-                        if response.status_code == 200:
-                            # Extract emails from raw HTML
-                            html_emails = self.email_pattern.findall(response.text)
-                            emails.update(html_emails)
-                            
-                            # Use trafilatura for clean text extraction
-                            text_content = trafilatura.extract(response.text)
-                            if text_content:
-                                found_emails = self.email_pattern.findall(text_content)
-                                emails.update(found_emails)
-                        elif response.status_code == 403:
-                            # If we get 403, try different user agent
-                            old_ua = self.session.headers['User-Agent']
-                            self.session.headers['User-Agent'] = random.choice(self.user_agents)
-                            time.sleep(random.uniform(1, 3))
-                            continue
-                    
-                    elif method.get('use_trafilatura'):
-                        # Fallback to trafilatura's fetch method
-                        downloaded = trafilatura.fetch_url(url)
-                        if downloaded:
-                            text_content = trafilatura.extract(downloaded)
-                            if text_content:
-                                found_emails = self.email_pattern.findall(text_content)
-                                emails.update(found_emails)
-                            
-                            # Also check raw HTML
-                            html_emails = self.email_pattern.findall(downloaded)
-                            emails.update(html_emails)
-                    
-                except Exception:
+        if homepage is not None:
+            with self.metrics.timed('parsing'):
+                for href, text in _LINK.findall(homepage.text):
+                    add(urljoin(homepage.url, html.unescape(href.strip())), _TAG.sub(' ', text))
+        
+        if len(candidates) < 5:
+            for url in self._sitemap_urls(site, fetched):
+                add(url)
+        
+        if not candidates:
+            return [urljoin(site, page) for page in self.common_pages if page]
+        
+        # Highest score first; among equals the shorter (less nested) path
+        return sorted(candidates, key=lambda url: (-candidates[url], len(urlparse(url).path), url))
+    
+    @staticmethod
+    def _site_host(url: str) -> str:
+        """Host of a URL without port and a leading www., so links to either form count as the same site"""
+        host = (urlparse(url).hostname or '').lower()
+        return host[4:] if host.startswith('www.') else host
+    
+    @staticmethod
+    def _contact_score(path: str, text: str = '') -> int:
+        """How strongly a link's path and text suggest a page listing contacts"""
+        words = set(re.findall(r'[a-z]+', f"{unquote(path)} {text}".lower()))
+        # Longer keywords also match as a prefix ('contactus', 'careers-page')
+        score = sum(weight for keyword, weight in CONTACT_KEYWORDS.items()
+                    if keyword in words or (len(keyword) >= 5 and any(word.startswith(keyword) for word in words)))
+        # Deeply nested pages (blog posts, products) are rarely the contact page
+        return score - path.strip('/').count('/') if score else 0
+    
+    def _sitemap_urls(self, domain: str, fetched: Dict, max_sitemaps: int = 3) -> List[str]:
+        """Page URLs from the sitemaps named in robots.txt, or /sitemap.xml; nested sitemap indexes are followed once"""
+        sitemaps = self.politeness.sitemaps(domain) or [urljoin(domain, '/sitemap.xml')]
+        urls = []
+        for depth in range(2):
+            nested = []
+            for sitemap_url in sitemaps[:max_sitemaps]:
+                if sitemap_url not in fetched and not self.politeness.allowed(sitemap_url):
+                    self.metrics.record(sitemap_url, robots_skipped=True)
+                    continue
+                response = self._get_page(sitemap_url, fetched, referer=domain)
+                if response is None or response.status_code != 200:
                     continue
-                    
-        except Exception:
-            pass
-        finally:
-            # Restore original referer
-            if original_referer:
-                self.session.headers['Referer'] = original_referer
+                with self.metrics.timed('parsing'):
+                    locs = _SITEMAP_LOC.findall(response.text)
+                    if '<sitemapindex' in response.text[:1000].lower():
+                        nested.extend(locs)
+                    else:
+                        urls.extend(html.unescape(loc) for loc in locs)
+            if not nested:
+                break
+            # Child sitemaps most likely to hold pages rather than posts or products
+            sitemaps = sorted(nested, key=lambda url: ('page' not in url.lower(), len(url)))
+        return urls
+    
+    def _request_headers(self, referer: Optional[str] = None, rotate_ua: bool = False) -> Dict[str, str]:
+        """
+        Per-request headers. The shared session's headers are never modified,
+        so concurrent requests from several threads don't interfere.
+        """
+        headers = {}
+        if referer:
+            headers['Referer'] = referer
+        if rotate_ua:
+            headers['User-Agent'] = random.choice(self.user_agents)
+        return headers
+    
+    def _fetch(self, method: str, url: str, headers: Dict[str, str], timeout: float) -> requests.Response:
+        """Make one request once the host's politeness interval allows it"""
+        waited = self.politeness.wait_turn(url)
+        self.metrics.add_time('sleeping', waited)
+        with self.metrics.timed('fetching'):
+            response = self.engine.request(method, url, headers, timeout)
+        response.timings['wait_ms'] = round(waited * 1000, 1)
+        return response
+    
+    def _cached_get(self, url: str, headers: Dict[str, str], timeout: float) -> requests.Response:
+        """
+        GET through the HTTP cache: a fresh entry is returned as is, a stale
+        one is revalidated with a conditional request and reused on 304.
+        """
+        if self.http_cache is None:
+            return self._fetch('GET', url, headers, timeout)
         
-        # Filter out common false positives
-        filtered_emails = set()
-        for email in emails:
-            if self._is_valid_email_discovery(email):
-                filtered_emails.add(email.lower())
+        entry = self.http_cache.get(url)
+        if entry is not None:
+            if self.http_cache.is_fresh(entry):
+                return HttpCache.to_response(entry)
+            headers = {**headers, **HttpCache.validators(entry)}
+        
+        response = self._fetch('GET', url, headers, timeout)
+        if response.status_code == 304 and entry is not None:
+            self.http_cache.revalidated(url)
+            cached = HttpCache.to_response(entry)
+            cached.revalidated = True
+            cached.timings = response.timings
+            return cached
+        
+        self.http_cache.store(url, response)
+        return response
+    
+    def _get_page(self, url: str, fetched: Dict, referer: Optional[str] = None) -> Optional[requests.Response]:
+        """
+        GET a URL unless this run already did. Responses are remembered under
+        the requested and the final (redirected) URL; a failed request is
+        remembered as None, with the exception under ('error', url).
+        Each request is recorded in `metrics`; the response's event is
+        available as `response.event`.
+        """
+        if url in fetched:
+            return fetched[url]
+        
+        try:
+            # Rotate user agent occasionally
+            headers = self._request_headers(referer, rotate_ua=random.random() < 0.3)
+            response = self._cached_get(url, headers, timeout=15)
+        except Exception as e:
+            fetched[url] = None
+            fetched[('error', url)] = e
+            self.metrics.record(url, error=f"{type(e).__name__}: {e}")
+            return None
+        
+        response.event = self.metrics.record_response(url, response)
+        fetched[url] = response
+        fetched.setdefault(response.url, response)
+        return response
+    
+    @staticmethod
+    def _is_page(response: Optional[requests.Response]) -> bool:
+        """Whether a fetch returned a page that can hold addresses"""
+        return (response is not None and response.status_code == 200
+                and is_text_content(response.headers.get('Content-Type')))
+    
+    def _fetch_robots(self, robots_url: str) -> Optional[str]:
+        """robots.txt text, or None when the site has none (everything allowed)"""
+        try:
+            response = self._cached_get(robots_url, {}, timeout=10)
+        except Exception as e:
+            # Treated like a missing robots.txt, but kept in the metrics
+            self.metrics.record(robots_url, error=f"{type(e).__name__}: {e}")
+            return None
+        self.metrics.record_response(robots_url, response)
+        if response.status_code == 200 and 'html' not in response.headers.get('Content-Type', ''):
+            return response.text
+        return None
+    
+    def _extract_emails(self, response: requests.Response) -> Set[str]:
+        """
+        Extract emails from a downloaded page in a single pass over its body.
+        Candidates are decoded (HTML entities, percent-encoded mailto: links)
+        before they are checked against the plain email pattern.
+        """
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        emails = set()
+        for match in _RAW_EMAIL.finditer(response.text):
+            self._add_candidate(match.group(), emails)
+        
+        if self.use_trafilatura:
+            try:
+                text_content = trafilatura.extract(response.text)
+                if text_content:
+                    emails.update(self.email_pattern.findall(text_content))
+            except Exception as e:
+                # The regex scan above still counts; the failure is kept with the page's event
+                if getattr(response, 'event', None) is not None:
+                    response.event['error'] = f"trafilatura: {type(e).__name__}: {e}"
         
-        return filtered_emails
+        # Filter out common false positives
+        return {email.lower() for email in emails if self._is_valid_email_discovery(email)}
+    
+    def _add_candidate(self, candidate: str, emails: Set[str]):
+        if '&' in candidate or '%' in candidate:
+            candidate = unquote(html.unescape(candidate))
+        emails.update(self.email_pattern.findall(candidate))
     
     def _is_valid_email_discovery(self, email: str) -> bool:
         """
@@ -324,30 +524,29 @@ class EmailDiscovery:
     
     def verify_email_patterns(self, patterns: List[str], validator) -> Dict:
         """
-        Verify discovered email patterns using the email validator
+        Verify discovered email patterns using the email validator. Patterns
+        share their domain, so they are checked as one batch: one DNS lookup,
+        one catch-all probe and one SMTP session per domain.
         """
-        results = []
-        
-        for email in patterns:
-            try:
-                result = validator.validate_single_email(email)
-                results.append({
-                    'email': email,
-                    'is_valid': result['is_valid'],
-                    'confidence': result['confidence'],
-                    'details': result
-                })
-            except Exception as e:
-                results.append({
-                    'email': email,
-                    'is_valid': False,
-                    'confidence': 0,
-                    'error': str(e)
-                })
+        try:
+            validations = validator.validate_domain_batch(patterns)
+            results = [{
+                'email': email,
+                'is_valid': result['is_valid'],
+                'confidence': result['confidence'],
+                'details': result
+            } for email, result in zip(patterns, validations)]
+        except Exception as e:
+            results = [{
+                'email': email,
+                'is_valid': False,
+                'confidence': 0,
+                'error': str(e)
+            } for email in patterns]
         
         return {
             'total_checked': len(results),
             'valid_emails': [r for r in results if r['is_valid']],
             'invalid_emails': [r for r in results if not r['is_valid']],
             'results': results
-        }
\ No newline at end of file
+        }
@@ -1,19 +1,65 @@
 import smtplib
-import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import random
+import socket
 import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
 from datetime import datetime
+from utils.send_queue import SendQueue
+from utils.domain_throttle import DomainQueues, get_domain_throttle, recipient_domain
+from utils.relay_pool import RelayPool, RelayUnavailableError, is_relay_error
+from utils.suppression import SuppressionList, HARD_BOUNCE, get_suppression_list
+
+
+def classify_smtp_error(error: Exception) -> Tuple[Optional[int], bool]:
+    """
+    Return the SMTP reply code carried by a send error (if any) and whether
+    the failure is transient. 4xx replies, timeouts and dropped connections
+    are worth retrying; 5xx replies and everything else are permanent.
+    """
+    code = None
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [reply[0] for reply in error.recipients.values()]
+        code = codes[0] if codes else None
+    elif isinstance(error, smtplib.SMTPResponseException):
+        code = error.smtp_code
+    
+    if code is not None and code > 0:
+        return code, 400 <= code < 500
+    
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                          socket.timeout, ConnectionError)):
+        return code, True
+    
+    return code, False
+
 
 class EmailSender:
-    def __init__(self, credentials: Dict):
+    def __init__(self, credentials: Dict, suppression_list: Optional[SuppressionList] = None):
         self.smtp_server = credentials['smtp_server']
         self.smtp_port = credentials['smtp_port']
         self.email = credentials['email']
         self.password = credentials['password']
+        
+        # Retry policy for transient send failures
+        self.max_retries = 3
+        self.retry_base_delay = 5.0
+        self.retry_max_delay = 300.0
+        
+        # Minimum seconds between sends to specific recipient domains; other
+        # domains use the delay passed to send_bulk_email
+        self.domain_intervals = dict(credentials.get('domain_intervals') or {})
+        
+        # The primary server plus any additional relays in credentials['relays']
+        self.relay_pool = RelayPool.from_credentials(credentials)
+        
+        # Addresses that bounced, unsubscribed or failed validation are never mailed
+        self.suppression_list = suppression_list or get_suppression_list()
     
     def send_single_email(self, recipient: str, subject: str, message: str, 
                          is_html: bool = False, attachments: Optional[List] = None) -> Dict:
@@ -24,7 +70,10 @@ class EmailSender:
             'recipient': recipient,
             'success': False,
             'error': None,
-            'sent_time': None
+            'sent_time': None,
+            'smtp_code': None,
+            'transient': False,
+            'hard_bounce': False
         }
         
         try:
@@ -45,52 +94,204 @@ class EmailSender:
                 for attachment in attachments:
                     self._add_attachment(msg, attachment)
             
-            # Create SMTP session
-            context = ssl.create_default_context()
+            # Send through the relay pool, failing over between relays
+            self._send_via_relays(msg)
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.email, self.password)
-                
-                # Send email
-                server.send_message(msg)
-                
-                result['success'] = True
-                result['sent_time'] = datetime.now().isoformat()
+            result['success'] = True
+            result['sent_time'] = datetime.now().isoformat()
                 
-        except smtplib.SMTPAuthenticationError:
+        except RelayUnavailableError as e:
+            result['error'] = f"{str(e)}. All relays are down or out of quota."
+            result['transient'] = True
+        except smtplib.SMTPAuthenticationError as e:
             result['error'] = "Authentication failed. Check email credentials."
-        except smtplib.SMTPRecipientsRefused:
+            result['smtp_code'], result['transient'] = classify_smtp_error(e)
+        except smtplib.SMTPRecipientsRefused as e:
             result['error'] = "Recipient email address was refused by server."
-        except smtplib.SMTPSenderRefused:
+            result['smtp_code'], result['transient'] = classify_smtp_error(e)
+            result['hard_bounce'] = not result['transient']
+        except smtplib.SMTPSenderRefused as e:
             result['error'] = "Sender email address was refused by server."
-        except smtplib.SMTPDataError:
+            result['smtp_code'], result['transient'] = classify_smtp_error(e)
+        except smtplib.SMTPDataError as e:
             result['error'] = "SMTP data error occurred."
-        except smtplib.SMTPConnectError:
+            result['smtp_code'], result['transient'] = classify_smtp_error(e)
+        except smtplib.SMTPConnectError as e:
             result['error'] = "Failed to connect to SMTP server."
-        except smtplib.SMTPServerDisconnected:
+            result['smtp_code'], result['transient'] = classify_smtp_error(e)
+        except smtplib.SMTPServerDisconnected as e:
             result['error'] = "SMTP server disconnected unexpectedly."
+            result['smtp_code'], result['transient'] = classify_smtp_error(e)
         except Exception as e:
             result['error'] = f"Unexpected error: {str(e)}"
+            result['smtp_code'], result['transient'] = classify_smtp_error(e)
+        
+        if result['smtp_code']:
+            result['error'] = f"{result['error']} (SMTP {result['smtp_code']})"
         
         return result
     
-    def send_bulk_email(self, recipients: List[str], subject: str, message: str, 
-                       is_html: bool = False, delay: float = 0.5) -> List[Dict]:
+    def _send_via_relays(self, msg: MIMEMultipart):
         """
-        Send email to multiple recipients with optional delay between sends
+        Send a message through a relay chosen by weight. Relay-side failures
+        move on to the next available relay; transient ones also take the
+        failing relay out of rotation for a while. The last relay error is
+        raised when every relay failed.
         """
-        results = []
+        tried = []
+        last_error = None
         
-        for i, recipient in enumerate(recipients):
-            result = self.send_single_email(recipient, subject, message, is_html)
-            results.append(result)
+        while True:
+            try:
+                relay = self.relay_pool.choose(exclude=tried)
+            except RelayUnavailableError:
+                if last_error is not None:
+                    raise last_error
+                raise
             
-            # Add delay between sends to avoid being flagged as spam
-            if i < len(recipients) - 1 and delay > 0:
-                time.sleep(delay)
+            try:
+                relay.send_message(msg)
+                relay.record_success()
+                return
+            except Exception as e:
+                if not is_relay_error(e):
+                    raise
+                if classify_smtp_error(e)[1]:
+                    relay.record_failure(str(e))
+                tried.append(relay)
+                last_error = e
+    
+    def send_bulk_email(self, recipients: List[str], subject: str, message: str, 
+                       is_html: bool = False, delay: float = 0.5,
+                       queue: Optional[SendQueue] = None, campaign_id: Optional[str] = None,
+                       progress_callback=None, result_callback=None) -> List[Dict]:
+        """
+        Send email to multiple recipients. Recipients are queued per destination
+        domain and domains are interleaved; `delay` is the minimum gap between
+        two sends to the same domain unless `domain_intervals` overrides it, and
+        a 421 reply backs off that domain only.
+        When a queue and campaign id are given, every outcome is recorded in the
+        queue as it happens and recipients handled by an earlier run are skipped.
+        Transient failures are retried with exponential backoff while the
+        remaining recipients keep being sent. With several relays configured,
+        up to one message per pooled relay connection is in flight at once.
+        Suppressed recipients are skipped and recorded as failed, and hard
+        bounces are added to the suppression list.
+        `progress_callback(done, total, recipient)` and `result_callback(result)`
+        are called on this thread as each recipient reaches its final outcome.
+        """
+        if queue is None or campaign_id is None:
+            queue = SendQueue(":memory:")
+            campaign_id = "adhoc"
+        
+        queue.enqueue(campaign_id, recipients)
+        # Recipients left in flight by a crashed run are attempted again
+        queue.recover(campaign_id)
+        pending = queue.pending(campaign_id, recipients)
+        total = len(set(recipients))
+        done = total - len(pending)
+        
+        # Pacing is shared process-wide; the intervals are this send's own
+        throttle = get_domain_throttle()
+        intervals = {domain.lower(): interval for domain, interval in self.domain_intervals.items()}
+        
+        def interval(domain: str) -> float:
+            return intervals.get(domain, max(0.0, delay))
+        
+        # Fresh recipients are ready immediately, deferred ones when their backoff ends
+        ready = DomainQueues(throttle)
+        for entry in pending:
+            ready.push(entry['recipient'], entry['next_attempt'], entry['attempts'])
+        
+        # One send in flight per pooled relay connection; outcomes are handled
+        # on this thread so the queue, throttle and callback see them in order
+        workers = max(1, self.relay_pool.concurrency)
+        completed = Queue()
+        in_flight = 0
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while ready or in_flight:
+                    timeout = None
+                    if ready and in_flight < workers:
+                        start_at = max(ready.next_ready_time(), self.relay_pool.available_at())
+                        timeout = start_at - time.time()
+                        if timeout <= 0:
+                            send_at, recipient, attempts = ready.pop()
+                            domain = recipient_domain(recipient)
+                            reason = self.suppression_list.reason(recipient)
+                            if reason:
+                                if queue.claim(campaign_id, recipient):
+                                    error = f"Suppressed ({reason}), not sent."
+                                    queue.mark_failed(campaign_id, recipient, error)
+                                    done += 1
+                                    if result_callback:
+                                        result_callback({'recipient': recipient, 'success': False,
+                                                         'error': error, 'sent_time': None})
+                                    if progress_callback:
+                                        progress_callback(done, total, recipient)
+                            elif not throttle.try_reserve(domain, interval(domain)):
+                                # Another send took the domain's slot; wait for the next one
+                                ready.push(recipient, send_at, attempts)
+                            elif queue.claim(campaign_id, recipient):
+                                executor.submit(self._send_to_queue, completed, recipient, attempts,
+                                                subject, message, is_html)
+                                in_flight += 1
+                            continue
+                    
+                    if not in_flight:
+                        time.sleep(timeout)
+                        continue
+                    
+                    try:
+                        recipient, attempts, result = completed.get(timeout=timeout)
+                    except Empty:
+                        continue
+                    in_flight -= 1
+                    attempts += 1
+                    domain = recipient_domain(recipient)
+                    throttle.record_send(domain, result['smtp_code'], interval(domain))
+                    
+                    if result['success']:
+                        queue.mark_sent(campaign_id, recipient, result['sent_time'])
+                    elif result['transient'] and attempts <= self.max_retries:
+                        retry_at = time.time() + self._retry_delay(attempts)
+                        queue.mark_deferred(campaign_id, recipient, result['error'], retry_at)
+                        ready.push(recipient, retry_at, attempts)
+                        continue
+                    else:
+                        if result['transient']:
+                            result['error'] = f"{result['error']} Gave up after {attempts} attempts."
+                        queue.mark_failed(campaign_id, recipient, result['error'])
+                        if result.get('hard_bounce'):
+                            self.suppression_list.add(recipient, HARD_BOUNCE, result['error'])
+                    
+                    done += 1
+                    if result_callback:
+                        result_callback(result)
+                    if progress_callback:
+                        progress_callback(done, total, recipient)
+        finally:
+            self.relay_pool.close()
         
-        return results
+        return queue.results(campaign_id, recipients)
+    
+    def _send_to_queue(self, completed: Queue, recipient: str, attempts: int,
+                       subject: str, message: str, is_html: bool):
+        """Worker: send one message and report the outcome to the send loop"""
+        result = None
+        try:
+            result = self.send_single_email(recipient, subject, message, is_html)
+        finally:
+            if result is None:
+                result = {'recipient': recipient, 'success': False, 'error': "Send worker crashed",
+                          'sent_time': None, 'smtp_code': None, 'transient': True}
+            completed.put((recipient, attempts, result))
+    
+    def _retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter for the next attempt after `attempts` failures"""
+        backoff = min(self.retry_max_delay, self.retry_base_delay * (2 ** (attempts - 1)))
+        return backoff / 2 + random.uniform(0, backoff / 2)
     
     def _add_attachment(self, msg: MIMEMultipart, file_path: str):
         """
@@ -121,22 +322,21 @@ class EmailSender:
             'error': None
         }
         
-        try:
-            context = ssl.create_default_context()
+        for relay in self.relay_pool.relays:
+            prefix = f"{relay.name}: " if len(self.relay_pool.relays) > 1 else ""
+            try:
+                relay.test_connection()
+            except smtplib.SMTPAuthenticationError:
+                result['error'] = f"{prefix}Authentication failed. Check your email and password."
+            except smtplib.SMTPConnectError:
+                result['error'] = f"Cannot connect to SMTP server {relay.smtp_server}:{relay.smtp_port}"
+            except Exception as e:
+                result['error'] = f"{prefix}Connection test failed: {str(e)}"
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.email, self.password)
-                
-                result['success'] = True
-                
-        except smtplib.SMTPAuthenticationError:
-            result['error'] = "Authentication failed. Check your email and password."
-        except smtplib.SMTPConnectError:
-            result['error'] = f"Cannot connect to SMTP server {self.smtp_server}:{self.smtp_port}"
-        except Exception as e:
-            result['error'] = f"Connection test failed: {str(e)}"
+            if result['error']:
+                return result
         
+        result['success'] = True
         return result
 
 class EmailTemplate:
@@ -2,8 +2,9 @@ import re
 import dns.resolver
 import smtplib
 import socket
+import uuid
 from email_validator import validate_email, EmailNotValidError
-from typing import Dict, List
+from typing import Dict, List, Optional
 import time
 
 class EmailValidator:
@@ -11,39 +12,41 @@ class EmailValidator:
         self.mx_cache = {}
         self.smtp_timeout = 10
         
-    def validate_single_email(self, email: str) -> Dict:
+    def validate_single_email(self, email: str, check_smtp: bool = True) -> Dict:
         """
-        Validate a single email address with comprehensive checks
+        Validate a single email address with comprehensive checks. Only a
+        syntax error or a domain that does not exist (NXDOMAIN) marks it
+        `undeliverable`; an SMTP rejection of the probe may be a policy
+        decision against the probing host, not a verdict on the mailbox.
         """
-        result = {
-            'email': email,
-            'is_valid': False,
-            'confidence': 0.0,
-            'syntax_valid': False,
-            'domain_valid': False,
-            'mx_valid': False,
-            'smtp_valid': False,
-            'error': None
-        }
+        result = self._empty_result(email)
         
         try:
-            # Step 1: Syntax validation using email-validator
+            # Step 1: Syntax validation using email-validator; the domain is
+            # resolved below, where a failed lookup is told apart from a
+            # domain that does not exist
             try:
-                valid_email = validate_email(email)
+                valid_email = validate_email(email, check_deliverability=False)
                 result['syntax_valid'] = True
                 result['confidence'] += 25
                 email = valid_email.email
             except EmailNotValidError as e:
                 result['error'] = f"Syntax error: {str(e)}"
+                result['undeliverable'] = True
                 return result
             
             # Step 2: Domain existence check
             domain = email.split('@')[1]
-            if self._check_domain_exists(domain):
+            exists = self._check_domain_exists(domain)
+            if exists:
                 result['domain_valid'] = True
                 result['confidence'] += 25
+            elif exists is None:
+                result['error'] = "Domain lookup failed, try again later"
+                return result
             else:
                 result['error'] = "Domain does not exist"
+                result['undeliverable'] = True
                 return result
             
             # Step 3: MX record check
@@ -56,38 +59,122 @@ class EmailValidator:
                 result['confidence'] += 10  # Domain exists but no MX
             
             # Step 4: SMTP verification (optional, can be slow)
-            if mx_records:
-                smtp_result = self._check_smtp_deliverability(email, mx_records[0])
-                if smtp_result['valid']:
-                    result['smtp_valid'] = True
-                    result['confidence'] += 25
-                elif smtp_result['error']:
-                    result['error'] = f"SMTP check: {smtp_result['error']}"
-                    result['confidence'] += 10  # Inconclusive
-            
-            # Final validation decision - SMTP verification must pass for email to be valid
-            if result['smtp_valid']:
-                result['is_valid'] = True
-            else:
-                result['is_valid'] = False
+            if mx_records and check_smtp:
+                self._apply_smtp_result(result, self._check_smtp_deliverability(email, mx_records[0]))
             
         except Exception as e:
             result['error'] = f"Validation error: {str(e)}"
         
         return result
     
-    def _check_domain_exists(self, domain: str) -> bool:
-        """Check if domain exists via DNS lookup"""
+    def validate_domain_batch(self, emails: List[str]) -> List[Dict]:
+        """
+        Validate many addresses with the checks of validate_single_email, but
+        look up each domain once and check all of a domain's addresses over
+        one SMTP session, after one catch-all probe. Results have the same
+        shape as validate_single_email's, in the order of `emails`.
+        """
+        results = [self._empty_result(email) for email in emails]
+        by_domain = {}  # domain -> [(normalized address, result)]
+        
+        for result in results:
+            try:
+                # The domain is resolved once below instead of per address
+                valid_email = validate_email(result['email'], check_deliverability=False)
+            except EmailNotValidError as e:
+                result['error'] = f"Syntax error: {str(e)}"
+                result['undeliverable'] = True
+                continue
+            result['syntax_valid'] = True
+            result['confidence'] += 25
+            by_domain.setdefault(valid_email.domain, []).append((valid_email.email, result))
+        
+        for domain, entries in by_domain.items():
+            try:
+                exists = self._check_domain_exists(domain)
+                if exists is None:
+                    for _, result in entries:
+                        result['error'] = "Domain lookup failed, try again later"
+                    continue
+                if not exists:
+                    for _, result in entries:
+                        result['error'] = "Domain does not exist"
+                        result['undeliverable'] = True
+                    continue
+                
+                mx_records = self._get_mx_records(domain)
+                for _, result in entries:
+                    result['domain_valid'] = True
+                    result['confidence'] += 25
+                    if mx_records:
+                        result['mx_valid'] = True
+                        result['confidence'] += 25
+                    else:
+                        result['error'] = "No MX records found"
+                        result['confidence'] += 10  # Domain exists but no MX
+                
+                if mx_records:
+                    smtp_results = self._check_smtp_batch([email for email, _ in entries], domain, mx_records[0])
+                    for email, result in entries:
+                        self._apply_smtp_result(result, smtp_results[email])
+            except Exception as e:
+                for _, result in entries:
+                    result['error'] = f"Validation error: {str(e)}"
+        
+        return results
+    
+    @staticmethod
+    def _empty_result(email: str) -> Dict:
+        return {
+            'email': email,
+            'is_valid': False,
+            'confidence': 0.0,
+            'syntax_valid': False,
+            'domain_valid': False,
+            'mx_valid': False,
+            'smtp_valid': False,
+            'undeliverable': False,
+            'error': None
+        }
+    
+    @staticmethod
+    def _apply_smtp_result(result: Dict, smtp_result: Dict):
+        """Add an SMTP check to a validation result; SMTP verification must pass for the email to be valid"""
+        if smtp_result['valid']:
+            result['smtp_valid'] = True
+            result['confidence'] += 25
+        elif smtp_result['error']:
+            result['error'] = f"SMTP check: {smtp_result['error']}"
+            result['confidence'] += 10  # Inconclusive
+        if smtp_result.get('catch_all'):
+            result['catch_all'] = True
+        result['is_valid'] = result['smtp_valid']
+    
+    def _check_domain_exists(self, domain: str) -> Optional[bool]:
+        """
+        Check if domain exists via DNS lookup. Only a definite NXDOMAIN means
+        it does not; None means the lookup failed (timeout, SERVFAIL) and
+        the answer is unknown.
+        """
         try:
             dns.resolver.resolve(domain, 'A')
             return True
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, Exception):
+        except dns.resolver.NXDOMAIN:
+            return False
+        except dns.resolver.NoAnswer:
+            # The name exists without an A record; mail may still go to its MX
+            return True
+        except Exception:
             try:
                 # Try AAAA record for IPv6
                 dns.resolver.resolve(domain, 'AAAA')
                 return True
-            except:
+            except dns.resolver.NXDOMAIN:
                 return False
+            except dns.resolver.NoAnswer:
+                return True
+            except Exception:
+                return None
     
     def _get_mx_records(self, domain: str) -> List[str]:
         """Get MX records for domain"""
@@ -101,9 +188,12 @@ class EmailValidator:
             mx_list = [str(getattr(mx, 'exchange', mx)).rstrip('.') for mx in sorted_mx]
             self.mx_cache[domain] = mx_list
             return mx_list
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, Exception):
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
             self.mx_cache[domain] = []
             return []
+        except Exception:
+            # Failed lookups are not cached, so a later check can succeed
+            return []
     
     def _check_smtp_deliverability(self, email: str, mx_server: str) -> Dict:
         """Check if email exists via SMTP verification"""
@@ -126,28 +216,81 @@ class EmailValidator:
             code, message = server.rcpt(email)
             server.quit()
             
-            if code == 250:
-                result['valid'] = True
-            elif code in [450, 451, 452]:
-                result['error'] = "Temporary failure, mailbox may exist"
-            elif code in [550, 551, 552, 553]:
-                result['error'] = "Mailbox does not exist or rejected"
-            else:
-                result['error'] = f"SMTP error {code}: {message}"
+            result.update(self._rcpt_result(code, message))
                 
-        except socket.timeout:
-            result['error'] = "SMTP connection timeout"
-        except socket.gaierror:
-            result['error'] = "Cannot connect to mail server"
-        except smtplib.SMTPConnectError:
-            result['error'] = "Cannot connect to SMTP server"
-        except smtplib.SMTPServerDisconnected:
-            result['error'] = "SMTP server disconnected"
         except Exception as e:
-            result['error'] = f"SMTP check failed: {str(e)}"
+            result['error'] = self._smtp_error(e)
         
         return result
     
+    def _check_smtp_batch(self, emails: List[str], domain: str, mx_server: str) -> Dict[str, Dict]:
+        """
+        Check several addresses of one domain over a single SMTP session.
+        A made-up address is tried first: when the server accepts it, it
+        accepts everything, and an accepted address proves nothing.
+        """
+        results = {email: {'valid': False, 'error': None} for email in emails}
+        checked = set()
+        
+        try:
+            server = smtplib.SMTP(timeout=self.smtp_timeout)
+            server.connect(mx_server, 25)
+            server.helo('example.com')
+            
+            code, message = server.mail('test@example.com')
+            if code != 250:
+                for email in emails:
+                    results[email]['error'] = f"MAIL command failed: {message}"
+                server.quit()
+                return results
+            
+            code, _ = server.rcpt(f"{uuid.uuid4().hex[:16]}@{domain}")
+            catch_all = code == 250
+            
+            for email in emails:
+                code, message = server.rcpt(email)
+                results[email].update(self._rcpt_result(code, message))
+                checked.add(email)
+            server.quit()
+            
+            if catch_all:
+                for result in results.values():
+                    result['catch_all'] = True
+                    if result['valid']:
+                        result['valid'] = False
+                        result['error'] = "Catch-all domain, mailbox cannot be confirmed"
+        
+        except Exception as e:
+            # Addresses checked before the session broke keep their answer
+            for email in emails:
+                if email not in checked:
+                    results[email]['error'] = self._smtp_error(e)
+        
+        return results
+    
+    @staticmethod
+    def _rcpt_result(code: int, message) -> Dict:
+        """Interpret the server's reply to RCPT TO"""
+        if code == 250:
+            return {'valid': True}
+        if code in [450, 451, 452]:
+            return {'error': "Temporary failure, mailbox may exist"}
+        if code in [550, 551, 552, 553]:
+            return {'error': "Mailbox does not exist or rejected"}
+        return {'error': f"SMTP error {code}: {message}"}
+    
+    @staticmethod
+    def _smtp_error(error: Exception) -> str:
+        if isinstance(error, socket.timeout):
+            return "SMTP connection timeout"
+        if isinstance(error, socket.gaierror):
+            return "Cannot connect to mail server"
+        if isinstance(error, smtplib.SMTPConnectError):
+            return "Cannot connect to SMTP server"
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return "SMTP server disconnected"
+        return f"SMTP check failed: {str(error)}"
+    
     def validate_bulk_emails(self, emails: List[str], progress_callback=None) -> List[Dict]:
         """Validate multiple emails with progress tracking"""
         results = []
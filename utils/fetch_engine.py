@@ -0,0 +1,180 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import requests
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from utils.crawl_politeness import url_host
+
+# Content types whose bodies are downloaded; anything else (PDFs, images,
+# video, scripts) is skipped after the headers
+TEXT_CONTENT_TYPES = ('text/html', 'text/plain', 'text/xml', 'application/xhtml+xml', 'application/xml')
+
+
+def is_text_content(content_type: Optional[str]) -> bool:
+    """Whether a Content-Type header names a page worth reading; a missing header counts as one"""
+    if not content_type:
+        return True
+    return content_type.split(';', 1)[0].strip().lower() in TEXT_CONTENT_TYPES
+
+
+# DNS lookup and connection setup time of the current thread's request, in seconds
+_timings = threading.local()
+_getaddrinfo = socket.getaddrinfo
+
+
+def _timed_getaddrinfo(*args, **kwargs):
+    """socket.getaddrinfo that adds its time to the DNS timing of a fetch in progress on this thread"""
+    if not getattr(_timings, 'active', False):
+        return _getaddrinfo(*args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return _getaddrinfo(*args, **kwargs)
+    finally:
+        _timings.dns += time.perf_counter() - start
+
+
+# urllib3 resolves hosts through socket.getaddrinfo; outside a fetch the
+# wrapper only passes the call on
+socket.getaddrinfo = _timed_getaddrinfo
+
+
+class _TimedConnection:
+    """Measures connection setup (DNS lookup, TCP and TLS) of new connections"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _timings.connect += time.perf_counter() - start
+
+
+class _TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(requests.adapters.HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class FetchEngine:
+    """
+    HTTP fetcher shared by crawler threads. It bounds the number of requests
+    in flight overall and per host, keeps a pool of keep-alive connections
+    per host, takes headers per request (the session is never modified) and
+    reads bodies as a stream, stopping at `max_bytes` and skipping bodies
+    that are not text or HTML. Threads waiting for a slot hold no connection,
+    so many more crawls than connections can be under way at once.
+
+    Every response gets `timings` in milliseconds: time queued for a slot,
+    DNS lookup and connection setup (0 when a kept-alive connection was
+    reused), time to the response headers and total time including the body.
+    """
+
+    def __init__(self, session: requests.Session, max_connections: int = 16, max_per_host: int = 2,
+                 chunk_size: int = 16384, max_bytes: int = 1024 * 1024):
+        self.session = session
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.chunk_size = chunk_size
+        # Larger bodies are cut off here; the part read so far is kept
+        self.max_bytes = max_bytes
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._host_slots = {}  # host -> [semaphore, number of threads using it]
+
+        # One pool of up to max_per_host connections for each recently used host
+        adapter = _TimedAdapter(pool_connections=max_connections * 4, pool_maxsize=max_per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                timeout: float = 15.0) -> requests.Response:
+        """
+        Make a request once a global and a per-host slot are free. The body is
+        read before returning; `response.truncated` tells whether it was cut
+        off at `max_bytes`, and a body that isn't text is left empty.
+        """
+        queued = time.perf_counter()
+        with self._host_slot(url_host(url)), self._slots:
+            start = time.perf_counter()
+            _timings.dns = _timings.connect = 0.0
+            _timings.active = True
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=timeout,
+                                                allow_redirects=True, stream=True)
+                headers_received = time.perf_counter()
+                try:
+                    response._content = self._read_body(response)
+                    response._content_consumed = True
+                finally:
+                    # Hands the connection back to the host's pool
+                    response.close()
+            finally:
+                _timings.active = False
+        end = time.perf_counter()
+
+        response.timings = {
+            'queued_ms': round((start - queued) * 1000, 1),
+            'dns_ms': round(_timings.dns * 1000, 1),
+            # Connection time is counted without the lookup
+            'connect_ms': round(max(0.0, _timings.connect - _timings.dns) * 1000, 1),
+            'ttfb_ms': round((headers_received - start) * 1000, 1),
+            'total_ms': round((end - start) * 1000, 1),
+        }
+        return response
+
+    def _read_body(self, response: requests.Response) -> bytes:
+        response.truncated = False
+        if not is_text_content(response.headers.get('Content-Type')):
+            return b''
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(self.chunk_size):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                # Closing the half-read response drops its connection
+                response.truncated = True
+                break
+        return b''.join(chunks)[:self.max_bytes]
+
+    @contextmanager
+    def _host_slot(self, host: str):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = [threading.BoundedSemaphore(self.max_per_host), 0]
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            # Forget hosts nobody is fetching from, so the table stays small
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._host_slots[host]
@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Responses worth keeping: pages, and pages that do not exist
+CACHEABLE_STATUSES = {200, 404, 410}
+
+# Response headers kept with a cached body
+KEPT_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+DEFAULT_CACHE_DB = os.environ.get("EMAIL_DISCOVERY_CACHE_DB", "http_cache.db")
+DEFAULT_FRESHNESS_HOURS = float(os.environ.get("EMAIL_DISCOVERY_CACHE_HOURS", "24"))
+
+
+class HttpCache:
+    """
+    Size-bounded on-disk cache of GET responses, keyed by URL. Bodies are
+    stored zlib-compressed together with their ETag and Last-Modified, so a
+    stale entry can be revalidated with a conditional GET that costs only
+    headers when the page has not changed. The least recently used entries
+    are evicted when the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, db_file: str = DEFAULT_CACHE_DB, max_bytes: int = 200 * 1024 * 1024,
+                 freshness_seconds: float = DEFAULT_FRESHNESS_HOURS * 3600):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        # Entries younger than this are used without asking the server
+        self.freshness_seconds = freshness_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                final_url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_ts REAL NOT NULL,
+                accessed_ts REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_ts)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Cached entry for a URL, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_ts = ? WHERE url = ?", (time.time(), url))
+        entry = dict(row)
+        entry['headers'] = json.loads(entry['headers'])
+        return entry
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry['fetched_ts'] < self.freshness_seconds
+
+    @staticmethod
+    def validators(entry: Dict) -> Dict[str, str]:
+        """Conditional request headers that let the server answer 304 Not Modified"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def store(self, url: str, response: requests.Response):
+        """Cache a response if its status is worth keeping"""
+        if response.status_code not in CACHEABLE_STATUSES:
+            return
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, final_url, status, headers, body, size, fetched_ts, accessed_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.url or url, response.status_code, json.dumps(headers), body, len(body), now, now)
+            )
+            self._total_bytes += len(body) - (old['size'] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def revalidated(self, url: str):
+        """Mark an entry fresh again after the server answered 304"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_ts = ? WHERE url = ?", (time.time(), url))
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is at 90% of its limit; caller holds the lock"""
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_ts").fetchall()
+        evicted = []
+        for row in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((row['url'],))
+            self._total_bytes -= row['size']
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", evicted)
+
+    @staticmethod
+    def to_response(entry: Dict) -> requests.Response:
+        """Rebuild a requests Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = entry['final_url']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = zlib.decompress(entry['body'])
+        response._content_consumed = True
+        response.from_cache = True
+        return response
+
+
+# Global HTTP cache instance
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+def get_http_cache() -> HttpCache:
+    """Get global discovery HTTP cache instance"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = HttpCache()
+    return _cache_instance
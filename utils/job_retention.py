@@ -0,0 +1,137 @@
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils.job_store import JobStore
+from utils.send_queue import SendQueue, get_send_queue
+
+# Statuses of jobs that will not run again and can be archived
+FINISHED_STATUSES = ['completed', 'failed', 'cancelled']
+
+DEFAULT_RETENTION_DAYS = float(os.environ.get("EMAIL_JOB_RETENTION_DAYS", "30"))
+DEFAULT_ARCHIVE_DIR = os.environ.get("EMAIL_JOB_ARCHIVE_DIR", "job_archive")
+
+# Maintenance lease that lets one process at a time archive jobs
+RETENTION_LEASE = 'retention'
+
+
+class JobRetention:
+    """
+    Moves finished jobs older than the retention period out of the job
+    store. Each job is appended, with its message, recipients and results
+    but without credentials, to a gzip-compressed JSON Lines file per month
+    of its scheduled time, and replaced in the store by a one-row summary
+    that keeps its counts for reporting. The jobs' rows in the send queue
+    are deleted at the same time.
+    
+    Archiving runs under the store's `retention` maintenance lease, so
+    processes sharing the store never append the same jobs to an archive
+    file at once.
+    """
+
+    def __init__(self, store: JobStore, retention_days: float = DEFAULT_RETENTION_DAYS,
+                 archive_dir: str = DEFAULT_ARCHIVE_DIR, batch_size: int = 100,
+                 send_queue: Optional[SendQueue] = None, owner: Optional[str] = None,
+                 lease_seconds: float = 300.0):
+        self.store = store
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.send_queue = send_queue or get_send_queue()
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+        # The lease is renewed after every batch
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+
+    def run(self, max_age_days: Optional[float] = None) -> int:
+        """
+        Archive finished jobs older than `max_age_days` (default: the
+        retention period); returns how many. Does nothing while another
+        process is archiving.
+        """
+        age = self.retention_days if max_age_days is None else max_age_days
+        with self._lock:
+            if not self._acquire_lease():
+                return 0
+            try:
+                return self._archive_before(time.time() - age * 86400)
+            finally:
+                self.store.release_maintenance_lease(RETENTION_LEASE, self.owner)
+
+    def archive_all(self, wait_seconds: float = 30.0) -> int:
+        """
+        Archive every finished job regardless of age. Waits up to
+        `wait_seconds` for another process's archiving to finish, then
+        raises TimeoutError.
+        """
+        deadline = time.time() + wait_seconds
+        with self._lock:
+            while not self._acquire_lease():
+                if time.time() >= deadline:
+                    raise TimeoutError("Another process is archiving jobs, try again shortly")
+                time.sleep(1.0)
+            try:
+                return self._archive_before(float('inf'))
+            finally:
+                self.store.release_maintenance_lease(RETENTION_LEASE, self.owner)
+
+    def _acquire_lease(self) -> bool:
+        return self.store.acquire_maintenance_lease(RETENTION_LEASE, self.owner, self.lease_seconds)
+
+    def _archive_before(self, cutoff: float) -> int:
+        archived = 0
+        while True:
+            job_ids = self.store.expired_job_ids(FINISHED_STATUSES, cutoff, self.batch_size)
+            if not job_ids:
+                return archived
+            self._archive_batch(job_ids)
+            archived += len(job_ids)
+            # Stop if the lease ran out and another process took it over
+            if not self._acquire_lease():
+                return archived
+
+    def _archive_batch(self, job_ids: List[str]):
+        jobs = [job for job in (self.store.get_job(job_id) for job_id in job_ids) if job]
+
+        by_file = {}
+        for job in jobs:
+            by_file.setdefault(self._archive_path(job), []).append(job)
+
+        # The archive is written before the jobs are deleted; if the process
+        # stops in between, the next run archives the same jobs once more
+        summaries = []
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for path, file_jobs in by_file.items():
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for job in file_jobs:
+                    f.write(json.dumps(self._archive_record(job)) + "\n")
+                    summaries.append({**job, 'archive_file': path})
+
+        # Finished jobs are never resumed, so their queue rows are no longer
+        # needed; they go first so a crash cannot leave them behind
+        self.send_queue.delete_campaigns([f"job-{job['id']}" for job in jobs])
+        self.store.archive_jobs(summaries)
+
+    def _archive_path(self, job: Dict) -> str:
+        month = datetime.fromisoformat(job['scheduled_time']).strftime('%Y-%m')
+        return os.path.join(self.archive_dir, f"jobs-{month}.jsonl.gz")
+
+    @staticmethod
+    def _archive_record(job: Dict) -> Dict:
+        record = {key: value for key, value in job.items() if key not in ('credentials', 'lease_owner')}
+        # Keep which account sent the job, never its password
+        record['sender'] = job.get('credentials', {}).get('email')
+        return record
+
+
+def read_archive(path: str):
+    """Iterate over the job records of an archive file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
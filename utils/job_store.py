@@ -0,0 +1,607 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Job fields that callers may update directly
+JOB_FIELDS = ['subject', 'message', 'recipients', 'credentials', 'is_html', 'status', 'scheduled_time',
+              'created_time', 'sent_time', 'success_count', 'total_count', 'error', 'priority',
+              'recurrence', 'spread_seconds', 'failed_count', 'started_time', 'progress_time']
+
+# Replicas that share scheduled jobs point this at a database on a shared volume
+DEFAULT_JOBS_DB = os.environ.get("EMAIL_JOBS_DB", "scheduled_jobs.db")
+
+
+def to_timestamp(value) -> float:
+    """Epoch seconds for an ISO datetime string or datetime-like value"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+# Payload columns of the jobs table: logical job field -> column holding its hash
+PAYLOAD_REFS = {
+    'message': 'message_ref',
+    'recipients': 'recipients_ref',
+    'credentials': 'credentials_ref',
+}
+
+
+# Job columns returned by listings, which leave out the payloads
+METADATA_COLUMNS = ['id', 'subject', 'is_html', 'status', 'scheduled_time', 'created_time', 'sent_time',
+                    'success_count', 'failed_count', 'total_count', 'error', 'priority', 'lease_owner',
+                    'recurrence', 'spread_seconds', 'started_time', 'progress_time']
+
+
+def payload_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class JobStore:
+    """
+    SQLite (WAL) storage for scheduled email jobs. Job metadata and
+    per-recipient results live in separate tables, so a status change
+    touches one row and due jobs are found through the (status, scheduled_ts)
+    index instead of rereading every job.
+
+    Message bodies, recipient lists and credentials are stored once in a
+    content-addressed payloads table and jobs hold their hashes, so the same
+    newsletter scheduled for ten segments is stored once. `list_jobs` reads
+    metadata only; `get_job` and `get_payload` load the payloads on demand.
+
+    Several scheduler processes may share one database. A job is sent by the
+    process holding its lease (see `claim_job`); a lease that is not renewed
+    expires, and another process can then take the job over.
+    """
+
+    def __init__(self, db_file: str = DEFAULT_JOBS_DB, legacy_file: Optional[str] = "scheduled_jobs.json"):
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        # Wait for other processes' write transactions instead of failing with "database is locked"
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._create_tables()
+        if legacy_file:
+            self._import_legacy_file(legacy_file)
+
+    def _create_tables(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    subject TEXT NOT NULL,
+                    message_ref TEXT NOT NULL,
+                    recipients_ref TEXT NOT NULL,
+                    credentials_ref TEXT NOT NULL,
+                    is_html INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    scheduled_time TEXT NOT NULL,
+                    scheduled_ts REAL NOT NULL,
+                    created_time TEXT NOT NULL,
+                    sent_time TEXT,
+                    success_count INTEGER NOT NULL DEFAULT 0,
+                    total_count INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    recurrence TEXT,
+                    spread_seconds REAL NOT NULL DEFAULT 0,
+                    failed_count INTEGER NOT NULL DEFAULT 0,
+                    started_time TEXT,
+                    progress_time TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_jobs_status_time ON jobs (status, scheduled_ts);
+
+                CREATE TABLE IF NOT EXISTS payloads (
+                    hash TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    recipient TEXT NOT NULL,
+                    success INTEGER NOT NULL,
+                    error TEXT,
+                    sent_time TEXT,
+                    PRIMARY KEY (job_id, position)
+                );
+            """)
+
+        self._create_stats()
+        self._create_archive_tables()
+
+    def _create_stats(self):
+        """
+        Per-status job counts and success/total sums, kept up to date by
+        triggers, so statistics cost the same however many jobs are stored
+        """
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'job_stats'"
+            ).fetchone()
+            self._conn.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_scheduled ON jobs (scheduled_ts);
+
+                CREATE TABLE IF NOT EXISTS job_stats (
+                    status TEXT PRIMARY KEY,
+                    jobs INTEGER NOT NULL DEFAULT 0,
+                    success_count INTEGER NOT NULL DEFAULT 0,
+                    total_count INTEGER NOT NULL DEFAULT 0
+                );
+
+                CREATE TRIGGER IF NOT EXISTS job_stats_insert AFTER INSERT ON jobs BEGIN
+                    INSERT OR IGNORE INTO job_stats (status) VALUES (NEW.status);
+                    UPDATE job_stats SET jobs = jobs + 1, success_count = success_count + NEW.success_count,
+                        total_count = total_count + NEW.total_count WHERE status = NEW.status;
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS job_stats_delete AFTER DELETE ON jobs BEGIN
+                    UPDATE job_stats SET jobs = jobs - 1, success_count = success_count - OLD.success_count,
+                        total_count = total_count - OLD.total_count WHERE status = OLD.status;
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS job_stats_update
+                AFTER UPDATE OF status, success_count, total_count ON jobs BEGIN
+                    UPDATE job_stats SET jobs = jobs - 1, success_count = success_count - OLD.success_count,
+                        total_count = total_count - OLD.total_count WHERE status = OLD.status;
+                    INSERT OR IGNORE INTO job_stats (status) VALUES (NEW.status);
+                    UPDATE job_stats SET jobs = jobs + 1, success_count = success_count + NEW.success_count,
+                        total_count = total_count + NEW.total_count WHERE status = NEW.status;
+                END;
+            """)
+            if not exists:
+                self._conn.execute(
+                    "INSERT INTO job_stats (status, jobs, success_count, total_count) "
+                    "SELECT status, COUNT(*), SUM(success_count), SUM(total_count) FROM jobs GROUP BY status"
+                )
+
+    def _import_legacy_file(self, legacy_file: str):
+        """One-time import of jobs from the old scheduled_jobs.json file"""
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                jobs = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for job in jobs:
+                    if job.get('status') == 'sending':
+                        # The old scheduler was stopped mid-run; some recipients may
+                        # already have been mailed, so the job must not run again
+                        job = {**job, 'status': 'failed',
+                               'error': "Interrupted before migration; some recipients may already have been mailed"}
+                    if not self._job_exists(job['id']):
+                        self._insert_job(job)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        try:
+            os.replace(legacy_file, legacy_file + ".migrated")
+        except OSError:
+            pass
+
+    def _job_exists(self, job_id: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone() is not None
+
+    def _store_payload(self, kind: str, value) -> str:
+        """Store a payload unless identical content is already stored; returns its hash"""
+        content = value if kind == 'message' else json.dumps(value, sort_keys=True)
+        digest = payload_hash(content)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO payloads (hash, kind, content, size) VALUES (?, ?, ?, ?)",
+            (digest, kind, content, len(content))
+        )
+        return digest
+
+    def _load_payload(self, kind: str, digest: str):
+        row = self._conn.execute("SELECT content FROM payloads WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"Missing {kind} payload {digest}")
+        return row['content'] if kind == 'message' else json.loads(row['content'])
+
+    def _insert_job(self, job: Dict):
+        refs = {column: self._store_payload(field, job[field]) for field, column in PAYLOAD_REFS.items()}
+        self._conn.execute(
+            "INSERT INTO jobs (id, subject, message_ref, recipients_ref, credentials_ref, is_html, status, "
+            "scheduled_time, scheduled_ts, created_time, sent_time, success_count, total_count, error, priority, "
+            "lease_owner, lease_expires, recurrence, spread_seconds, failed_count, started_time, progress_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job['id'], job['subject'], refs['message_ref'], refs['recipients_ref'], refs['credentials_ref'],
+                int(bool(job.get('is_html'))), job['status'], job['scheduled_time'],
+                to_timestamp(job['scheduled_time']), job['created_time'], job.get('sent_time'),
+                job.get('success_count', 0), job.get('total_count', len(job['recipients'])), job.get('error'),
+                job.get('priority', 0), job.get('lease_owner'), job.get('lease_expires'),
+                job.get('recurrence'), job.get('spread_seconds', 0), job.get('failed_count', 0),
+                job.get('started_time'), job.get('progress_time')
+            )
+        )
+        self._write_results(job['id'], job.get('results') or [])
+
+    def _write_results(self, job_id: str, results: List[Dict]):
+        self._conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+        self._conn.executemany(
+            "INSERT INTO job_results (job_id, position, recipient, success, error, sent_time) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((job_id, i, r['recipient'], int(bool(r['success'])), r.get('error'), r.get('sent_time'))
+             for i, r in enumerate(results))
+        )
+
+    def add_job(self, job: Dict):
+        """Store a new job, including its payloads"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert_job(job)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def set_status(self, job_id: str, status: str, expected: Optional[str] = None) -> bool:
+        """
+        Change a job's status. With `expected`, the change only happens if the
+        job is currently in that status; returns whether a row changed.
+        """
+        with self._lock:
+            if expected is None:
+                cursor = self._conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ? WHERE id = ? AND status = ?", (status, job_id, expected)
+                )
+            return cursor.rowcount == 1
+
+    def claim_job(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Take a lease on a job for `owner` and mark it sending. Succeeds for a
+        pending job whose scheduled time has passed, or for a sending job whose
+        lease has expired (its owner stopped renewing it). Returns whether this
+        owner now holds the lease.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'sending', lease_owner = ?, lease_expires = ?, "
+                "started_time = COALESCE(started_time, ?) "
+                "WHERE id = ? AND ((status = 'pending' AND scheduled_ts <= ?) OR "
+                "(status = 'sending' AND lease_expires < ?))",
+                (owner, now + lease_seconds, datetime.now().isoformat(), job_id, now, now)
+            )
+            return cursor.rowcount == 1
+
+    def renew_leases(self, owner: str, job_ids: List[str], lease_seconds: float) -> List[str]:
+        """Extend the owner's leases on the given jobs; returns the ids it still holds"""
+        if not job_ids:
+            return []
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND status = 'sending' "
+                    f"AND id IN ({placeholders})",
+                    (time.time() + lease_seconds, owner, *job_ids)
+                )
+                rows = self._conn.execute(
+                    f"SELECT id FROM jobs WHERE lease_owner = ? AND status = 'sending' AND id IN ({placeholders})",
+                    (owner, *job_ids)
+                ).fetchall()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [row['id'] for row in rows]
+
+    def release_job(self, job_id: str, owner: str, next_job: Optional[Dict] = None, **fields) -> bool:
+        """
+        Update a job and drop its lease, but only while `owner` still holds
+        it, so a process that lost its lease cannot overwrite the new owner's
+        state. `next_job` (the next run of a recurring job) is added in the
+        same transaction, so a crash cannot end the series. Returns whether
+        the update happened.
+        """
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+
+        assignments = "".join(f"{name} = ?, " for name in fields)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    f"UPDATE jobs SET {assignments}lease_owner = NULL, lease_expires = NULL "
+                    f"WHERE id = ? AND lease_owner = ? AND status = 'sending'",
+                    (*fields.values(), job_id, owner)
+                )
+                released = cursor.rowcount == 1
+                if released and next_job is not None:
+                    self._insert_job(next_job)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return released
+
+    def expired_lease_job_ids(self, now: Optional[float] = None) -> List[str]:
+        """
+        Ids of sending jobs whose owner has stopped renewing the lease; a
+        sending job without a lease is never taken over
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'sending' AND lease_expires < ?",
+                (now or time.time(),)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def set_results(self, job_id: str, results: List[Dict]):
+        """Replace the stored per-recipient results of a job"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_results(job_id, results)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def record_results(self, job_id: str, results: List[Tuple[int, Dict]]):
+        """
+        Store (position, result) outcomes of a running job as they arrive and
+        move its success/failed counters by the difference, so progress can be
+        read from the job row without loading its results.
+        """
+        if not results:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = {}
+                positions = [position for position, _ in results]
+                for i in range(0, len(positions), 500):
+                    batch = positions[i:i + 500]
+                    rows = self._conn.execute(
+                        f"SELECT position, success FROM job_results WHERE job_id = ? "
+                        f"AND position IN ({', '.join('?' for _ in batch)})",
+                        (job_id, *batch)
+                    )
+                    previous.update((row['position'], bool(row['success'])) for row in rows)
+
+                succeeded = failed = 0
+                for position, result in results:
+                    success = bool(result['success'])
+                    if position in previous:
+                        if previous[position] == success:
+                            continue
+                        succeeded -= previous[position]
+                        failed -= not previous[position]
+                    succeeded += success
+                    failed += not success
+                    previous[position] = success
+
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO job_results (job_id, position, recipient, success, error, sent_time) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    ((job_id, position, r['recipient'], int(bool(r['success'])), r.get('error'), r.get('sent_time'))
+                     for position, r in results)
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET success_count = success_count + ?, failed_count = failed_count + ?, "
+                    "progress_time = ? WHERE id = ?",
+                    (succeeded, failed, datetime.now().isoformat(), job_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Full job dict, including payloads and results"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._metadata_from_row(row)
+            for field, column in PAYLOAD_REFS.items():
+                job[field] = self._load_payload(field, row[column])
+            job['results'] = self.get_results(job_id)
+            return job
+
+    def get_payload(self, job_id: str, field: str):
+        """One payload field ('message', 'recipients' or 'credentials') of a job"""
+        column = PAYLOAD_REFS[field]
+        with self._lock:
+            row = self._conn.execute(f"SELECT {column} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            return self._load_payload(field, row[column])
+
+    def get_results(self, job_id: str) -> List[Dict]:
+        """Stored per-recipient results of a job"""
+        with self._lock:
+            return [
+                {'recipient': r['recipient'], 'success': bool(r['success']), 'error': r['error'], 'sent_time': r['sent_time']}
+                for r in self._conn.execute(
+                    "SELECT recipient, success, error, sent_time FROM job_results WHERE job_id = ? ORDER BY position",
+                    (job_id,)
+                )
+            ]
+
+    def list_jobs(self, status: Optional[str] = None, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """
+        Metadata of jobs without payloads or results, latest scheduled time
+        first, optionally for one status and one page (`limit`, `offset`)
+        """
+        query = f"SELECT {', '.join(METADATA_COLUMNS)} FROM jobs"
+        params = []
+        if status is not None:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY scheduled_ts DESC"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._metadata_from_row(row) for row in rows]
+
+    def job_stats(self) -> Dict[str, Dict[str, int]]:
+        """{status: {'jobs', 'success_count', 'total_count'}} for every status with jobs"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, jobs, success_count, total_count FROM job_stats WHERE jobs > 0"
+            ).fetchall()
+        return {row['status']: {'jobs': row['jobs'], 'success_count': row['success_count'],
+                                'total_count': row['total_count']} for row in rows}
+
+    def pending_schedule(self) -> List[Tuple[float, str]]:
+        """(scheduled epoch seconds, job id) of every pending job, earliest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT scheduled_ts, id FROM jobs WHERE status = 'pending' ORDER BY scheduled_ts"
+            ).fetchall()
+        return [(row['scheduled_ts'], row['id']) for row in rows]
+
+    def _create_archive_tables(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS job_summaries (
+                    id TEXT PRIMARY KEY,
+                    subject TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    scheduled_time TEXT NOT NULL,
+                    sent_time TEXT,
+                    success_count INTEGER NOT NULL,
+                    failed_count INTEGER NOT NULL,
+                    total_count INTEGER NOT NULL,
+                    recurrence TEXT,
+                    archive_file TEXT NOT NULL,
+                    archived_time TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS maintenance_leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires REAL NOT NULL
+                );
+            """)
+
+    def expired_job_ids(self, statuses: List[str], before_ts: float, limit: int) -> List[str]:
+        """Ids of jobs in one of `statuses` scheduled before `before_ts`, oldest first"""
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND scheduled_ts < ? "
+                f"ORDER BY scheduled_ts LIMIT ?",
+                (*statuses, before_ts, limit)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def archive_jobs(self, summaries: List[Dict]):
+        """
+        Replace jobs by their summary records in one transaction: the jobs,
+        their results and payloads no other job uses are deleted
+        """
+        if not summaries:
+            return
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO job_summaries (id, subject, status, scheduled_time, sent_time, "
+                    "success_count, failed_count, total_count, recurrence, archive_file, archived_time) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((s['id'], s['subject'], s['status'], s['scheduled_time'], s.get('sent_time'),
+                      s.get('success_count', 0), s.get('failed_count', 0), s.get('total_count', 0),
+                      s.get('recurrence'), s['archive_file'], now) for s in summaries)
+                )
+                self._conn.executemany("DELETE FROM jobs WHERE id = ?", ((s['id'],) for s in summaries))
+                self._delete_unreferenced_payloads()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_job_summaries(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Summary records of archived jobs, latest scheduled first"""
+        query = "SELECT * FROM job_summaries ORDER BY scheduled_time DESC"
+        params = []
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params = [limit, offset]
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params).fetchall()]
+
+    def archived_stats(self) -> Dict[str, int]:
+        """Number of archived jobs and their success/total email counts"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS jobs, COALESCE(SUM(success_count), 0) AS success_count, "
+                "COALESCE(SUM(total_count), 0) AS total_count FROM job_summaries"
+            ).fetchone()
+        return dict(row)
+
+    def acquire_maintenance_lease(self, name: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Take (or renew) a named lease so only one of several processes sharing
+        the store runs a maintenance task at a time
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT owner, expires FROM maintenance_leases WHERE name = ?", (name,)
+                ).fetchone()
+                acquired = row is None or row['owner'] == owner or row['expires'] < now
+                if acquired:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO maintenance_leases (name, owner, expires) VALUES (?, ?, ?)",
+                        (name, owner, now + lease_seconds)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return acquired
+
+    def release_maintenance_lease(self, name: str, owner: str):
+        """Give up a named lease held by `owner`, so another process can take it at once"""
+        with self._lock:
+            self._conn.execute("DELETE FROM maintenance_leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def _delete_unreferenced_payloads(self):
+        self._conn.execute(
+            "DELETE FROM payloads WHERE hash NOT IN ("
+            + " UNION ".join(f"SELECT {column} FROM jobs" for column in PAYLOAD_REFS.values())
+            + ")"
+        )
+
+    def _metadata_from_row(self, row: sqlite3.Row) -> Dict:
+        job = {column: row[column] for column in METADATA_COLUMNS}
+        job['is_html'] = bool(job['is_html'])
+        if job['error'] is None:
+            del job['error']
+        return job
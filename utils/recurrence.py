@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+# (name, lowest value, highest value) of the five cron fields
+CRON_FIELDS = [
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day of month', 1, 31),
+    ('month', 1, 12),
+    ('day of week', 0, 6),
+]
+
+# Shorthands offered by the scheduling form
+PRESETS = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+
+class CronSchedule:
+    """
+    Standard five-field cron expression (minute hour day-of-month month
+    day-of-week) with `*`, lists, ranges and `/step`. Day of week runs from
+    0 (Sunday) to 6; 7 is accepted as Sunday. As in cron, when both day
+    fields are restricted a day matches if either of them does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = PRESETS.get(expression.strip(), expression.strip())
+        parts = self.expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {len(parts)}: '{expression}'")
+
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(part, name, low, high) for part, (name, low, high) in zip(parts, CRON_FIELDS)
+        )
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse_field(field: str, name: str, low: int, high: int) -> Set[int]:
+        values = set()
+        # Sunday may be written as 7
+        top = 7 if name == 'day of week' else high
+        for item in field.split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                if not step_text.isdigit() or int(step_text) == 0:
+                    raise ValueError(f"Invalid step in cron {name} field: '{field}'")
+                step = int(step_text)
+
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start_text, end_text = item.split('-', 1)
+                if not (start_text.isdigit() and end_text.isdigit()):
+                    raise ValueError(f"Invalid range in cron {name} field: '{field}'")
+                start, end = int(start_text), int(end_text)
+            elif item.isdigit():
+                start = int(item)
+                end = start if step == 1 else top
+            else:
+                raise ValueError(f"Invalid cron {name} field: '{field}'")
+
+            if start < low or end > top or start > end:
+                raise ValueError(f"Cron {name} field out of range {low}-{top}: '{field}'")
+            values.update(value % 7 if name == 'day of week' else value for value in range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching time strictly after `after`, to the minute"""
+        candidate = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Any valid expression matches at least once within a leap-year cycle
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Cron expression never matches: '{self.expression}'")
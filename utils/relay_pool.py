@@ -0,0 +1,251 @@
+import random
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+class RelayUnavailableError(Exception):
+    """Raised when no configured relay can accept a message right now"""
+
+
+def is_relay_error(error: Exception) -> bool:
+    """
+    Whether a send error is caused by the relay rather than the message or
+    recipient, so the message should be retried on another relay.
+    """
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)):
+        return False
+    return isinstance(error, (smtplib.SMTPAuthenticationError, smtplib.SMTPConnectError,
+                              smtplib.SMTPServerDisconnected, smtplib.SMTPHeloError,
+                              smtplib.SMTPSenderRefused, OSError))
+
+
+class Relay:
+    """
+    One authorized SMTP relay with its own pool of authenticated connections,
+    an optional hourly send quota and a health state that takes the relay out
+    of rotation for a growing cool-down after consecutive failures.
+    """
+
+    def __init__(self, credentials: Dict, hourly_quota: Optional[int] = None, pool_size: int = 1,
+                 timeout: float = 30.0):
+        self.smtp_server = credentials['smtp_server']
+        self.smtp_port = int(credentials['smtp_port'])
+        self.username = credentials['email']
+        self.password = credentials['password']
+        self.hourly_quota = hourly_quota
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.max_idle = 60.0
+
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._idle = []  # (connection, last used)
+        self._sent_times = deque()
+
+    @property
+    def name(self) -> str:
+        return f"{self.smtp_server}:{self.smtp_port}"
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        """Whether the relay is healthy and below its quota"""
+        now = now or time.time()
+        return now >= self.down_until and self._quota_left(now)
+
+    def available_at(self, now: Optional[float] = None) -> float:
+        """Earliest time (epoch seconds) at which the relay can send again"""
+        now = now or time.time()
+        ready = max(now, self.down_until)
+        with self._lock:
+            self._expire_sent_times(now)
+            if self.hourly_quota is not None and len(self._sent_times) >= self.hourly_quota:
+                ready = max(ready, self._sent_times[0] + 3600)
+        return ready
+
+    def send_message(self, msg):
+        """Send a message over a pooled connection, reconnecting once if a reused connection dropped"""
+        with self._slots:
+            conn, reused = self._checkout()
+            try:
+                conn.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self._discard(conn)
+                if not reused:
+                    raise
+                # The server closed an idle pooled connection; retry once on a fresh one
+                conn = self._connect()
+                try:
+                    conn.send_message(msg)
+                except Exception:
+                    self._discard(conn)
+                    raise
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                # smtplib resets the transaction, so the connection stays usable
+                self._checkin(conn)
+                raise
+            except Exception:
+                self._discard(conn)
+                raise
+            self._checkin(conn)
+
+        with self._lock:
+            self._sent_times.append(time.time())
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.last_error = None
+
+    def record_failure(self, error: str):
+        """Take the relay out of rotation for an exponentially growing cool-down"""
+        self.consecutive_failures += 1
+        self.down_until = time.time() + min(300.0, 10.0 * 2 ** (self.consecutive_failures - 1))
+        self.last_error = error
+        self.close()
+
+    def test_connection(self):
+        """Open, authenticate and close a fresh connection; raises on failure"""
+        conn = self._connect()
+        self._discard(conn)
+
+    def close(self):
+        """Close all idle pooled connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _checkout(self):
+        now = time.time()
+        with self._lock:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if now - last_used < self.max_idle:
+                    return conn, True
+                self._discard(conn)
+        return self._connect(), False
+
+    def _checkin(self, conn):
+        with self._lock:
+            self._idle.append((conn, time.time()))
+
+    def _connect(self):
+        context = ssl.create_default_context()
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            server.starttls(context=context)
+            server.login(self.username, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        return server
+
+    def _discard(self, conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _quota_left(self, now: float) -> bool:
+        if self.hourly_quota is None:
+            return True
+        with self._lock:
+            self._expire_sent_times(now)
+            return len(self._sent_times) < self.hourly_quota
+
+    def _expire_sent_times(self, now: float):
+        while self._sent_times and now - self._sent_times[0] >= 3600:
+            self._sent_times.popleft()
+
+
+def relay_key(credentials: Dict, hourly_quota: Optional[int] = None, pool_size: int = 1) -> Tuple:
+    """
+    Identity of a relay: the server account together with every setting of
+    it, so senders configured differently (e.g. a job saved before a password
+    change) never share, or reconfigure, each other's relay
+    """
+    return (credentials['smtp_server'].strip().lower(), int(credentials['smtp_port']),
+            credentials['email'].strip().lower(), credentials['password'], hourly_quota, max(1, int(pool_size)))
+
+
+# Relays shared by every sender in the process, so quotas and health state
+# hold across campaigns and concurrently running jobs
+_relays: Dict[Tuple, Relay] = {}
+_relays_lock = threading.Lock()
+
+def get_relay(credentials: Dict, hourly_quota: Optional[int] = None, pool_size: int = 1) -> Relay:
+    """Get the process-wide relay for a server account and its settings"""
+    key = relay_key(credentials, hourly_quota, pool_size)
+    with _relays_lock:
+        relay = _relays.get(key)
+        if relay is None:
+            relay = _relays[key] = Relay(credentials, hourly_quota, pool_size)
+    return relay
+
+
+class RelayPool:
+    """
+    Distributes sends over several relays in proportion to their weights and
+    fails over to the remaining relays when one is down or out of quota.
+    """
+
+    def __init__(self, relays: List[Relay], weights: Optional[List[float]] = None):
+        self.relays = relays
+        # Weights belong to the pool, as the relays may be shared with other pools
+        self.weights = [max(0.0, float(weight)) for weight in weights] if weights else [1.0] * len(relays)
+
+    @classmethod
+    def from_credentials(cls, credentials: Dict) -> 'RelayPool':
+        """
+        Build a pool from the sender credentials. The primary server is always
+        the first relay; `credentials['relays']` may list additional ones with
+        their own smtp_server, smtp_port, email, password and optional weight,
+        hourly_quota and pool_size.
+        
+        Relays are taken from the process-wide registry, so pools built from
+        the same accounts and settings share their connections, quotas and
+        health state.
+        """
+        relays, weights = [], []
+        for config in [credentials] + list(credentials.get('relays') or []):
+            relay = get_relay(config, config.get('hourly_quota'), config.get('pool_size', 1))
+            if relay not in relays:
+                relays.append(relay)
+                weights.append(config.get('weight', 1.0))
+        return cls(relays, weights)
+
+    def _weighted(self):
+        return [(relay, weight) for relay, weight in zip(self.relays, self.weights) if weight > 0]
+
+    @property
+    def concurrency(self) -> int:
+        """Number of messages the pool can have in flight at once"""
+        return sum(relay.pool_size for relay, _ in self._weighted())
+
+    def choose(self, exclude: Optional[List[Relay]] = None) -> Relay:
+        """Pick an available relay at random in proportion to its weight"""
+        now = time.time()
+        candidates = [(relay, weight) for relay, weight in self._weighted()
+                      if relay not in (exclude or []) and relay.is_available(now)]
+        if not candidates:
+            raise RelayUnavailableError("No SMTP relay available")
+        return random.choices([relay for relay, _ in candidates], weights=[weight for _, weight in candidates])[0]
+
+    def available_at(self) -> float:
+        """Earliest time (epoch seconds) at which any relay can send again"""
+        now = time.time()
+        return min((relay.available_at(now) for relay, _ in self._weighted()), default=now)
+
+    def close(self):
+        for relay in self.relays:
+            relay.close()
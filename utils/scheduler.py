@@ -1,45 +1,118 @@
-import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import heapq
+import math
 import os
-from datetime import datetime, timedelta
-import pandas as pd
-from typing import Dict, List, Optional
+import socket
 import uuid
 import threading
 import time
 from utils.email_sender import EmailSender
+from utils.job_retention import JobRetention
+from utils.job_store import JobStore, to_timestamp
+from utils.recurrence import CronSchedule
+from utils.send_queue import get_send_queue
+
+# Kinds of scheduler timers
+CLAIM = 'claim'
+CHUNK = 'chunk'
 
 class EmailScheduler:
-    def __init__(self):
-        self.jobs_file = "scheduled_jobs.json"
-        self.jobs = self._load_jobs()
-        self.running = False
-        self._start_scheduler_thread()
+    """
+    Background service that sends due jobs. Use `get_scheduler()` to get the
+    single per-process instance instead of constructing one per page render.
     
-    def _load_jobs(self) -> List[Dict]:
-        """Load scheduled jobs from file"""
-        if os.path.exists(self.jobs_file):
-            try:
-                with open(self.jobs_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
+    Due jobs are split into recipient chunks that a bounded pool of workers
+    sends in priority order. Each job has at most one chunk queued at a time
+    and re-queues its next chunk behind the other waiting jobs, so jobs of
+    equal priority take turns and a large campaign cannot starve small ones.
+    
+    Several processes (app replicas) can run a scheduler against one shared
+    job store. A process sends a job only while it holds the job's lease,
+    renews its leases from a heartbeat thread and takes over jobs whose
+    lease expired because their owner crashed. The shared send queue records
+    every delivered recipient, so a takeover continues where the crashed
+    owner stopped.
     
-    def _save_jobs(self):
-        """Save jobs to file"""
-        with open(self.jobs_file, 'w') as f:
-            json.dump(self.jobs, f, indent=2, default=str)
+    A job may repeat on a cron schedule (each run becomes a new job once the
+    previous one finishes) and may drip its recipients evenly over a time
+    window, in which case its chunks are released on a timer at a steady
+    rate instead of back to back.
+    """
+    
+    def __init__(self, max_workers: int = 4, chunk_size: int = 200, lease_seconds: float = 120.0):
+        self.store = JobStore()
+        self.running = False
+        self._thread = None
+        
+        # Identifies this process in job leases
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = lease_seconds / 3
+        # Due jobs beyond this are left for other replicas to claim and
+        # retried here after `busy_retry_delay` seconds. Drip jobs idle until
+        # their next chunk is due do not count.
+        self.max_active_jobs = max_workers * 2
+        self.busy_retry_delay = 5.0
+        self._heartbeat_thread = None
+        self._stopped = threading.Event()
+        
+        # Finished jobs past the retention period are archived this often,
+        # by one replica at a time
+        self.retention = JobRetention(self.store, owner=self.node_id)
+        self.retention_interval = 3600.0
+        self._retention_thread = None
+        
+        # Run queue of (-priority, order, job id) chunks waiting for a worker
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._run_queue = []
+        self._run_order = 0
+        self._active_jobs = {}  # job id -> {'job', 'sender', 'next_chunk', 'chunk_size', 'chunk_interval', 'positions', 'lost', 'waiting'}
+        # Running jobs write their outcomes to the job store at least this often
+        self.progress_flush_interval = 1.0
+        # Drip jobs are cut into chunks of about this many seconds of sending
+        self.drip_chunk_seconds = 60.0
+        self._work_available = threading.Condition()
+        self._workers = []
+        
+        # Min-heap of (due epoch seconds, job id, kind). The loop sleeps until
+        # the earliest entry is due and is woken early whenever the heap
+        # changes. CLAIM entries claim a pending job; CHUNK entries release the
+        # next chunk of a drip job this process is running.
+        self._timers = []
+        self._wakeup = threading.Condition()
+        # Rebuild the heap from the store this often, as a safety net
+        self.resync_interval = 300.0
+        
+        self._start_scheduler_thread()
     
     def schedule_email(self, recipients: List[str], subject: str, message: str, 
-                      scheduled_time: pd.Timestamp, credentials: Dict, 
-                      is_html: bool = False) -> str:
-        """
-        Schedule an email to be sent at a specific time
+                      scheduled_time: datetime, credentials: Dict, 
+                      is_html: bool = False, priority: int = 0,
+                      recurrence: Optional[str] = None, spread_seconds: float = 0) -> str:
         """
-        job_id = str(uuid.uuid4())[:8]
+        Schedule an email to be sent at a specific time. Jobs with a higher
+        priority get free workers first when several jobs are due.
         
-        job = {
-            'id': job_id,
+        `recurrence` is a cron expression (e.g. "0 9 * * 1" or "@daily") that
+        repeats the job after each run; `spread_seconds` spreads the sends
+        evenly over that many seconds from the scheduled time.
+        """
+        job = self._new_job(recipients, subject, message, scheduled_time, credentials, is_html,
+                            priority, recurrence, spread_seconds)
+        self.store.add_job(job)
+        self._add_job_timer(job)
+        return job['id']
+    
+    def _new_job(self, recipients: List[str], subject: str, message: str, scheduled_time: datetime,
+                 credentials: Dict, is_html: bool = False, priority: int = 0,
+                 recurrence: Optional[str] = None, spread_seconds: float = 0) -> Dict:
+        """A pending job record, ready to be stored"""
+        if recurrence:
+            recurrence = CronSchedule(recurrence).expression  # raises ValueError if invalid
+        return {
+            'id': str(uuid.uuid4())[:8],
             'recipients': recipients,
             'subject': subject,
             'message': message,
@@ -51,101 +124,387 @@ class EmailScheduler:
             'sent_time': None,
             'success_count': 0,
             'total_count': len(recipients),
+            'priority': priority,
+            'recurrence': recurrence or None,
+            'spread_seconds': max(0.0, float(spread_seconds)),
             'results': []
         }
-        
-        self.jobs.append(job)
-        self._save_jobs()
-        
-        return job_id
     
-    def get_scheduled_jobs(self) -> List[Dict]:
-        """Get all scheduled jobs"""
-        # Reload from file to get latest status
-        self.jobs = self._load_jobs()
-        return self.jobs
+    def _add_job_timer(self, job: Dict):
+        # The stored ISO time is the source of truth: a naive value is local
+        # time there, whereas pandas' timestamp() would read it as UTC
+        self._add_timer(to_timestamp(job['scheduled_time']), job['id'])
+    
+    def get_scheduled_jobs(self, status: Optional[str] = None, limit: Optional[int] = None,
+                           offset: int = 0) -> List[Dict]:
+        """Get scheduled jobs, latest first, optionally one status and one page (metadata only; see get_job_details)"""
+        return self.store.list_jobs(status, limit, offset)
+    
+    def get_job_statistics(self) -> Dict[str, Dict[str, int]]:
+        """Job count and success/total email counts per status"""
+        return self.store.job_stats()
+    
+    def get_archived_statistics(self) -> Dict[str, int]:
+        """Number of archived jobs and their success/total email counts"""
+        return self.store.archived_stats()
+    
+    def get_job_details(self, job_id: str) -> Optional[Dict]:
+        """Get one job with its message, recipients, credentials and results"""
+        return self.store.get_job(job_id)
     
     def cancel_job(self, job_id: str) -> bool:
         """Cancel a scheduled job"""
-        for job in self.jobs:
-            if job['id'] == job_id and job['status'] == 'pending':
-                job['status'] = 'cancelled'
-                self._save_jobs()
-                return True
-        return False
-    
-    def clear_completed_jobs(self):
-        """Remove completed and cancelled jobs"""
-        self.jobs = [job for job in self.jobs if job['status'] in ['pending', 'sending']]
-        self._save_jobs()
+        cancelled = self.store.set_status(job_id, 'cancelled', expected='pending')
+        if cancelled:
+            self._remove_timer(job_id)
+        return cancelled
+    
+    def clear_completed_jobs(self) -> int:
+        """
+        Archive completed, failed and cancelled jobs now; returns how many.
+        Raises TimeoutError if another replica keeps archiving meanwhile.
+        """
+        return self.retention.archive_all()
     
     def _start_scheduler_thread(self):
         """Start the background scheduler thread"""
         if not self.running:
             self.running = True
-            thread = threading.Thread(target=self._scheduler_loop, daemon=True)
-            thread.start()
+            self._thread = threading.Thread(target=self._scheduler_loop, name="email-scheduler", daemon=True)
+            self._thread.start()
+            
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="email-scheduler-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+            
+            self._retention_thread = threading.Thread(target=self._retention_loop, name="email-scheduler-retention", daemon=True)
+            self._retention_thread.start()
+            
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"email-scheduler-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+    
+    def stop(self):
+        """Stop the background scheduler thread, heartbeat and workers"""
+        with self._wakeup:
+            self.running = False
+            self._wakeup.notify_all()
+        with self._work_available:
+            self._work_available.notify_all()
+        self._stopped.set()
+    
+    def _add_timer(self, due: float, job_id: str, kind: str = CLAIM):
+        with self._wakeup:
+            heapq.heappush(self._timers, (due, job_id, kind))
+            self._wakeup.notify_all()
+    
+    def _remove_timer(self, job_id: str):
+        with self._wakeup:
+            self._timers = [timer for timer in self._timers if timer[1] != job_id or timer[2] != CLAIM]
+            heapq.heapify(self._timers)
+            self._wakeup.notify_all()
+    
+    def _reload_timers(self):
+        """Rebuild the claim timers from the pending jobs in the store"""
+        pending = self.store.pending_schedule()
+        with self._wakeup:
+            chunks = [timer for timer in self._timers if timer[2] == CHUNK]
+            self._timers = [(due, job_id, CLAIM) for due, job_id in pending] + chunks
+            heapq.heapify(self._timers)
+            self._wakeup.notify_all()
+    
+    def _next_due_jobs(self) -> List[Tuple[str, str]]:
+        """
+        Sleep until the earliest timer is due and pop every due (job id, kind).
+        Returns an empty list when it is time to resync with the store.
+        """
+        with self._wakeup:
+            resync_at = time.time() + self.resync_interval
+            while self.running:
+                now = time.time()
+                if self._timers and self._timers[0][0] <= now:
+                    due = []
+                    while self._timers and self._timers[0][0] <= now:
+                        _, job_id, kind = heapq.heappop(self._timers)
+                        due.append((job_id, kind))
+                    return due
+                if now >= resync_at:
+                    return []
+                
+                wake_at = min(resync_at, self._timers[0][0]) if self._timers else resync_at
+                self._wakeup.wait(wake_at - now)
+            return []
     
     def _scheduler_loop(self):
         """Main scheduler loop - runs in background thread"""
+        self._reload_timers()
+        
         while self.running:
             try:
-                current_time = datetime.now()
-                self.jobs = self._load_jobs()  # Reload from file
-                
-                for job in self.jobs:
-                    if job['status'] == 'pending':
-                        scheduled_time = pd.Timestamp(job['scheduled_time']).to_pydatetime()
-                        
-                        if current_time >= scheduled_time:
-                            self._execute_job(job)
+                due_jobs = self._next_due_jobs()
+                if not due_jobs:
+                    # Pick up jobs added to the store by other instances and replicas
+                    if self.running:
+                        self._reload_timers()
+                    continue
                 
-                # Check every 30 seconds
-                time.sleep(30)
+                for job_id, kind in due_jobs:
+                    if kind == CHUNK:
+                        self._release_drip_chunk(job_id)
+                        continue
+                    if not self._has_capacity():
+                        # Busy: let another replica take it, or try again shortly
+                        self._add_timer(time.time() + self.busy_retry_delay, job_id)
+                        continue
+                    # Lease the job so no other scheduler sends it too;
+                    # cancelled or already-claimed jobs fail the claim
+                    if self.store.claim_job(job_id, self.node_id, self.lease_seconds):
+                        self._start_job(self.store.get_job(job_id))
                 
             except Exception as e:
                 print(f"Scheduler error: {str(e)}")
                 time.sleep(60)  # Wait longer on error
     
-    def _execute_job(self, job: Dict):
-        """Execute a scheduled email job"""
-        try:
-            job['status'] = 'sending'
-            self._save_jobs()
+    def _has_capacity(self) -> bool:
+        with self._work_available:
+            busy = sum(1 for state in self._active_jobs.values() if not state['waiting'])
+            return busy < self.max_active_jobs
+    
+    def _heartbeat_loop(self):
+        """Renew the leases of running jobs and take over jobs abandoned by crashed replicas"""
+        while self.running:
+            try:
+                self._renew_leases()
+                self._take_over_expired_jobs()
+            except Exception as e:
+                print(f"Scheduler heartbeat error: {str(e)}")
             
-            # Create email sender
-            sender = EmailSender(job['credentials'])
+            self._stopped.wait(self.heartbeat_interval)
+    
+    def _retention_loop(self):
+        """Periodically archive old finished jobs to keep the job store small"""
+        while self.running:
+            try:
+                self.retention.run()
+            except Exception as e:
+                print(f"Scheduler retention error: {str(e)}")
+            
+            self._stopped.wait(self.retention_interval)
+    
+    def _renew_leases(self):
+        with self._work_available:
+            job_ids = list(self._active_jobs)
+        held = set(self.store.renew_leases(self.node_id, job_ids, self.lease_seconds))
+        
+        with self._work_available:
+            for job_id in job_ids:
+                if job_id not in held and job_id in self._active_jobs:
+                    # Another replica took the job over; stop after the current chunk
+                    self._active_jobs[job_id]['lost'] = True
+    
+    def _take_over_expired_jobs(self):
+        for job_id in self.store.expired_lease_job_ids():
+            with self._work_available:
+                if job_id in self._active_jobs:
+                    continue
+            if not self._has_capacity():
+                return
+            if self.store.claim_job(job_id, self.node_id, self.lease_seconds):
+                self._start_job(self.store.get_job(job_id))
+    
+    def _start_job(self, job: Dict):
+        """Hand a claimed job to the worker pool"""
+        chunk_size, chunk_interval = self._chunking(job)
+        # Result position of each recipient, in the order the send queue numbers them
+        positions = {}
+        for recipient in job['recipients']:
+            positions.setdefault(recipient, len(positions))
+        with self._work_available:
+            self._active_jobs[job['id']] = {
+                'job': job,
+                'sender': EmailSender(job['credentials']),
+                'next_chunk': 0,
+                'chunk_size': chunk_size,
+                'chunk_interval': chunk_interval,
+                'positions': positions,
+                'lost': False,
+                # Set while a drip job waits on the timer of its next chunk
+                'waiting': False
+            }
+            self._queue_chunk(job['id'])
+    
+    def _chunking(self, job: Dict):
+        """(recipients per chunk, seconds between chunk starts) for a job"""
+        total = len(job['recipients'])
+        spread = job.get('spread_seconds') or 0
+        if spread <= 0 or total <= 1:
+            return self.chunk_size, 0.0
+        
+        # Small chunks at a steady rate: about one chunk per drip_chunk_seconds
+        per_second = total / spread
+        chunk_size = max(1, min(self.chunk_size, math.ceil(per_second * self.drip_chunk_seconds)))
+        return chunk_size, chunk_size / per_second
+    
+    def _chunk_due_time(self, job_id: str) -> float:
+        """When the job's next chunk may start; caller holds _work_available"""
+        state = self._active_jobs[job_id]
+        # Slots are fixed from the scheduled time, so a job taken over after
+        # a crash catches up on the chunks it already missed
+        return to_timestamp(state['job']['scheduled_time']) + state['next_chunk'] * state['chunk_interval']
+    
+    def _release_drip_chunk(self, job_id: str):
+        """Queue the next chunk of a drip job whose chunk timer fired"""
+        with self._work_available:
+            if job_id in self._active_jobs:
+                self._active_jobs[job_id]['waiting'] = False
+                self._queue_chunk(job_id)
+    
+    def _queue_chunk(self, job_id: str):
+        """Put the job's next chunk at the back of its priority level; caller holds _work_available"""
+        priority = self._active_jobs[job_id]['job'].get('priority', 0)
+        heapq.heappush(self._run_queue, (-priority, self._run_order, job_id))
+        self._run_order += 1
+        self._work_available.notify()
+    
+    def _worker_loop(self):
+        """Worker thread: send one chunk at a time of the most urgent waiting job"""
+        while self.running:
+            with self._work_available:
+                while self.running and not self._run_queue:
+                    self._work_available.wait()
+                if not self.running:
+                    return
+                _, _, job_id = heapq.heappop(self._run_queue)
+                state = self._active_jobs[job_id]
+                if state['lost']:
+                    del self._active_jobs[job_id]
+                    continue
+                chunk_size = state['chunk_size']
+                start = state['next_chunk'] * chunk_size
+                state['next_chunk'] += 1
+            
+            job = state['job']
+            chunk = job['recipients'][start:start + chunk_size]
+            try:
+                self._send_chunk(state, chunk)
+            except Exception as e:
+                with self._work_available:
+                    del self._active_jobs[job_id]
+                self._fail_job(job, e)
+                continue
             
-            # Send emails
-            results = sender.send_bulk_email(
-                job['recipients'],
+            with self._work_available:
+                if start + chunk_size < len(job['recipients']):
+                    due = self._chunk_due_time(job_id)
+                    if due > time.time():
+                        state['waiting'] = True
+                        self._add_timer(due, job_id, CHUNK)
+                    else:
+                        self._queue_chunk(job_id)
+                    continue
+                del self._active_jobs[job_id]
+            self._finish_job(job)
+    
+    def _send_chunk(self, state: Dict, chunk: List[str]):
+        """
+        Send one chunk. The send queue records each outcome so an interrupted
+        job resumes where it stopped; outcomes are also streamed into the job
+        store in small batches so the job's progress is visible while it runs.
+        """
+        job = state['job']
+        positions = state['positions']
+        pending_results = []
+        last_flush = time.time()
+        
+        def flush():
+            nonlocal last_flush
+            self.store.record_results(job['id'], pending_results)
+            pending_results.clear()
+            last_flush = time.time()
+        
+        def record(result):
+            pending_results.append((positions[result['recipient']], result))
+            if len(pending_results) >= 100 or time.time() - last_flush >= self.progress_flush_interval:
+                flush()
+        
+        try:
+            state['sender'].send_bulk_email(
+                chunk,
                 job['subject'],
                 job['message'],
-                job['is_html']
+                job['is_html'],
+                queue=get_send_queue(),
+                campaign_id=f"job-{job['id']}",
+                result_callback=record
             )
-            
-            # Update job status
+        finally:
+            flush()
+    
+    def _finish_job(self, job: Dict):
+        """Store the results of a job whose chunks have all been sent"""
+        try:
+            # The queue also holds outcomes from before a crash or takeover
+            # that were never streamed, so it is the final word on results
+            results = get_send_queue().results(f"job-{job['id']}")
             successful_sends = sum(1 for r in results if r['success'])
             
-            job['status'] = 'completed'
-            job['sent_time'] = datetime.now().isoformat()
-            job['success_count'] = successful_sends
-            job['results'] = results
-            
-            self._save_jobs()
-            
+            self.store.set_results(job['id'], results)
+            next_run = self._next_run(job)
+            released = self.store.release_job(
+                job['id'],
+                self.node_id,
+                next_job=next_run,
+                status='completed',
+                sent_time=datetime.now().isoformat(),
+                success_count=successful_sends,
+                failed_count=len(results) - successful_sends
+            )
+        except Exception as e:
+            self._fail_job(job, e)
+            return
+        if released and next_run:
+            self._add_job_timer(next_run)
+    
+    def _fail_job(self, job: Dict, error: Exception):
+        next_run = self._next_run(job)
+        released = self.store.release_job(
+            job['id'],
+            self.node_id,
+            next_job=next_run,
+            status='failed',
+            error=str(error),
+            sent_time=datetime.now().isoformat()
+        )
+        if released and next_run:
+            self._add_job_timer(next_run)
+    
+    def _next_run(self, job: Dict) -> Optional[Dict]:
+        """
+        The next run of a recurring job, to be stored together with the
+        job's outcome; runs missed while it was sending are skipped
+        """
+        if not job.get('recurrence'):
+            return None
+        try:
+            last_run = max(datetime.fromisoformat(job['scheduled_time']), datetime.now())
+            next_time = CronSchedule(job['recurrence']).next_after(last_run)
+            return self._new_job(
+                job['recipients'], job['subject'], job['message'], next_time, job['credentials'],
+                job['is_html'], priority=job.get('priority', 0),
+                recurrence=job['recurrence'], spread_seconds=job.get('spread_seconds', 0)
+            )
         except Exception as e:
-            job['status'] = 'failed'
-            job['error'] = str(e)
-            job['sent_time'] = datetime.now().isoformat()
-            self._save_jobs()
+            print(f"Scheduler error: could not schedule next run of job {job['id']}: {str(e)}")
+            return None
 
 # Global scheduler instance
 _scheduler_instance = None
+_scheduler_lock = threading.Lock()
 
 def get_scheduler() -> EmailScheduler:
-    """Get global scheduler instance"""
+    """Get global scheduler instance, starting it on first use"""
     global _scheduler_instance
-    if _scheduler_instance is None:
-        _scheduler_instance = EmailScheduler()
+    with _scheduler_lock:
+        if _scheduler_instance is None:
+            _scheduler_instance = EmailScheduler()
     return _scheduler_instance
@@ -0,0 +1,236 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Per-recipient delivery states
+QUEUED = 'queued'
+IN_FLIGHT = 'in_flight'
+SENT = 'sent'
+FAILED = 'failed'
+DEFERRED = 'deferred'
+
+# Replicas that share scheduled jobs must share the queue as well
+DEFAULT_QUEUE_DB = os.environ.get("EMAIL_SEND_QUEUE_DB", "send_queue.db")
+
+
+class SendQueue:
+    """
+    Durable outbound queue that records the delivery state of every recipient
+    of a campaign as each send completes, so an interrupted campaign can be
+    resumed without re-mailing recipients that were already handled.
+    """
+
+    def __init__(self, db_file: str = DEFAULT_QUEUE_DB):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the outbound table if it does not exist yet"""
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbound (
+                    campaign_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    recipient TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    sent_time TEXT,
+                    next_attempt REAL NOT NULL DEFAULT 0,
+                    updated_time TEXT NOT NULL,
+                    PRIMARY KEY (campaign_id, recipient)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbound_status ON outbound (campaign_id, status, position)"
+            )
+
+    def enqueue(self, campaign_id: str, recipients: List[str]) -> int:
+        """
+        Add recipients to a campaign. Recipients that are already known to the
+        campaign keep their recorded state. Returns the number of new rows.
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            offset = self._conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM outbound WHERE campaign_id = ?",
+                (campaign_id,)
+            ).fetchone()[0]
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO outbound (campaign_id, position, recipient, status, updated_time) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((campaign_id, offset + i, recipient, QUEUED, now) for i, recipient in enumerate(recipients))
+            )
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def pending(self, campaign_id: str, recipients: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Recipients of a campaign (optionally only those in `recipients`) that
+        still have to be attempted, in enqueue order, with the number of
+        earlier attempts and the earliest time (epoch seconds) at which the
+        next attempt may be made.
+        """
+        rows = self._select(
+            "SELECT position, recipient, attempts, next_attempt FROM outbound "
+            "WHERE campaign_id = ? AND status IN (?, ?)",
+            (campaign_id, QUEUED, DEFERRED), recipients
+        )
+        return [{'recipient': row['recipient'], 'attempts': row['attempts'], 'next_attempt': row['next_attempt']}
+                for row in rows]
+
+    def _select(self, query: str, params: tuple, recipients: Optional[List[str]] = None) -> List[sqlite3.Row]:
+        """
+        Run a query over a campaign's rows, restricted to `recipients` if given,
+        and return the rows in enqueue order. Recipient filters are sent in
+        batches to stay below SQLite's bound-parameter limit.
+        """
+        with self._lock:
+            if recipients is None:
+                return self._conn.execute(query + " ORDER BY position", params).fetchall()
+
+            rows = []
+            unique = list(dict.fromkeys(recipients))
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ", ".join("?" for _ in batch)
+                rows.extend(self._conn.execute(
+                    f"{query} AND recipient IN ({placeholders})", (*params, *batch)
+                ).fetchall())
+        return sorted(rows, key=lambda row: row['position'])
+
+    def recover(self, campaign_id: str) -> int:
+        """
+        Put recipients that were in flight when a previous run stopped back in
+        the queue. Whether the server accepted those messages is unknown, so
+        at most one message per interrupted sender may be delivered twice.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbound SET status = ?, updated_time = ? WHERE campaign_id = ? AND status = ?",
+                (QUEUED, datetime.now().isoformat(), campaign_id, IN_FLIGHT)
+            )
+            return cursor.rowcount
+
+    def claim(self, campaign_id: str, recipient: str) -> bool:
+        """
+        Mark a recipient as in flight. Returns False if the recipient is not
+        waiting to be sent, e.g. because another sender already claimed it.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbound SET status = ?, attempts = attempts + 1, updated_time = ? "
+                "WHERE campaign_id = ? AND recipient = ? AND status IN (?, ?)",
+                (IN_FLIGHT, datetime.now().isoformat(), campaign_id, recipient, QUEUED, DEFERRED)
+            )
+            return cursor.rowcount == 1
+
+    def mark_sent(self, campaign_id: str, recipient: str, sent_time: Optional[str] = None):
+        """Record a successful delivery"""
+        self._set_state(campaign_id, recipient, SENT, None, sent_time or datetime.now().isoformat())
+
+    def mark_failed(self, campaign_id: str, recipient: str, error: Optional[str]):
+        """Record a delivery that will not be retried"""
+        self._set_state(campaign_id, recipient, FAILED, error, None)
+
+    def mark_deferred(self, campaign_id: str, recipient: str, error: Optional[str], next_attempt: float):
+        """Record a delivery that should be attempted again at `next_attempt` (epoch seconds)"""
+        self._set_state(campaign_id, recipient, DEFERRED, error, None, next_attempt)
+
+    def _set_state(self, campaign_id: str, recipient: str, status: str, error: Optional[str],
+                   sent_time: Optional[str], next_attempt: float = 0):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbound SET status = ?, error = ?, sent_time = ?, next_attempt = ?, updated_time = ? "
+                "WHERE campaign_id = ? AND recipient = ?",
+                (status, error, sent_time, next_attempt, datetime.now().isoformat(), campaign_id, recipient)
+            )
+
+    def results(self, campaign_id: str, recipients: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Final per-recipient results of a campaign (optionally only those in
+        `recipients`), shaped like `EmailSender.send_single_email` results
+        """
+        rows = self._select(
+            "SELECT position, recipient, status, error, sent_time FROM outbound "
+            "WHERE campaign_id = ? AND status IN (?, ?)",
+            (campaign_id, SENT, FAILED), recipients
+        )
+        return [
+            {
+                'recipient': row['recipient'],
+                'success': row['status'] == SENT,
+                'error': row['error'],
+                'sent_time': row['sent_time']
+            }
+            for row in rows
+        ]
+
+    def progress(self, campaign_id: str) -> Dict[str, int]:
+        """Number of recipients of a campaign in each state"""
+        counts = {QUEUED: 0, IN_FLIGHT: 0, SENT: 0, FAILED: 0, DEFERRED: 0}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM outbound WHERE campaign_id = ? GROUP BY status",
+                (campaign_id,)
+            ).fetchall()
+        for row in rows:
+            counts[row['status']] = row['n']
+        return counts
+
+    def reset_campaign(self, campaign_id: str):
+        """Forget all recorded state of a campaign so it can be sent again from scratch"""
+        with self._lock:
+            self._conn.execute("DELETE FROM outbound WHERE campaign_id = ?", (campaign_id,))
+
+    def delete_campaigns(self, campaign_ids: List[str]) -> int:
+        """Remove the rows of campaigns that will never be sent again; returns how many rows"""
+        if not campaign_ids:
+            return 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = 0
+                for campaign_id in campaign_ids:
+                    cursor = self._conn.execute("DELETE FROM outbound WHERE campaign_id = ?", (campaign_id,))
+                    deleted += cursor.rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return deleted
+
+
+def make_campaign_id(sender: str, subject: str, message: str, recipients: List[str]) -> str:
+    """
+    Derive a stable campaign id from the message and its recipients, so that
+    sending the same campaign again after a crash resumes the earlier run.
+    """
+    digest = hashlib.sha256()
+    for part in [sender, subject, message] + list(recipients):
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+# Global queue instance
+_queue_instance = None
+_queue_lock = threading.Lock()
+
+def get_send_queue() -> SendQueue:
+    """Get global send queue instance"""
+    global _queue_instance
+    with _queue_lock:
+        if _queue_instance is None:
+            _queue_instance = SendQueue()
+    return _queue_instance
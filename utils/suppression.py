@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Reasons an address is suppressed
+HARD_BOUNCE = 'hard_bounce'
+UNSUBSCRIBED = 'unsubscribed'
+INVALID = 'invalid'
+
+DEFAULT_SUPPRESSION_DB = os.environ.get("EMAIL_SUPPRESSION_DB", "suppression.db")
+
+
+def normalize_address(email: str) -> str:
+    return str(email).strip().lower()
+
+
+class SuppressionList:
+    """
+    Persistent set of addresses that must not be mailed again. Entries live
+    in SQLite; membership checks are answered from an in-memory dict, so
+    every check before a send is O(1). The dict is reloaded every
+    `refresh_seconds` so suppressions added by other replicas sharing the
+    database are picked up.
+    """
+
+    def __init__(self, db_file: str = DEFAULT_SUPPRESSION_DB, refresh_seconds: float = 60.0):
+        self.db_file = db_file
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS suppressions (
+                email TEXT PRIMARY KEY,
+                reason TEXT NOT NULL,
+                detail TEXT,
+                created_time TEXT NOT NULL
+            )
+        """)
+        self._reasons = {}
+        self._loaded_at = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """Reload the in-memory index from the database"""
+        with self._lock:
+            rows = self._conn.execute("SELECT email, reason FROM suppressions").fetchall()
+            self._reasons = {row['email']: row['reason'] for row in rows}
+            self._loaded_at = time.time()
+
+    def _refresh_if_stale(self):
+        if time.time() - self._loaded_at >= self.refresh_seconds:
+            self.refresh()
+
+    def __len__(self) -> int:
+        self._refresh_if_stale()
+        return len(self._reasons)
+
+    def __contains__(self, email: str) -> bool:
+        return self.reason(email) is not None
+
+    def reason(self, email: str) -> Optional[str]:
+        """Why an address is suppressed, or None if it may be mailed"""
+        self._refresh_if_stale()
+        return self._reasons.get(normalize_address(email))
+
+    def add(self, email: str, reason: str, detail: Optional[str] = None):
+        """Suppress an address; an existing entry keeps its original reason"""
+        self.add_many([(email, reason, detail)])
+
+    def add_many(self, entries: List[Tuple[str, str, Optional[str]]]):
+        """Suppress several (email, reason, detail) entries in one transaction"""
+        now = datetime.now().isoformat()
+        rows = [(normalize_address(email), reason, detail, now) for email, reason, detail in entries]
+        rows = [row for row in rows if row[0] not in self._reasons]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO suppressions (email, reason, detail, created_time) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute("COMMIT")
+            for email, reason, _, _ in rows:
+                self._reasons.setdefault(email, reason)
+
+    def remove(self, email: str) -> bool:
+        """Allow an address to be mailed again"""
+        email = normalize_address(email)
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM suppressions WHERE email = ?", (email,))
+            self._reasons.pop(email, None)
+            return cursor.rowcount > 0
+
+    def counts(self) -> Dict[str, int]:
+        """Number of suppressed addresses per reason"""
+        self._refresh_if_stale()
+        counts = {}
+        for reason in self._reasons.values():
+            counts[reason] = counts.get(reason, 0) + 1
+        return counts
+
+    def split(self, recipients: List[str]) -> Tuple[List[str], List[str]]:
+        """Split recipients into (allowed, suppressed)"""
+        allowed, suppressed = [], []
+        for recipient in recipients:
+            (suppressed if recipient in self else allowed).append(recipient)
+        return allowed, suppressed
+
+
+# Global suppression list instance
+_suppression_instance = None
+_suppression_lock = threading.Lock()
+
+def get_suppression_list() -> SuppressionList:
+    """Get global suppression list instance"""
+    global _suppression_instance
+    with _suppression_lock:
+        if _suppression_instance is None:
+            _suppression_instance = SuppressionList()
+    return _suppression_instance